@@ -4,23 +4,111 @@
 ChatGPT Conversation Viewer - Flask Web Application
 """
 
-from flask import Flask, render_template, request, redirect, url_for, abort, jsonify, make_response, send_file
+from flask import Flask, Response, render_template, request, redirect, url_for, abort, jsonify, make_response, send_file
+from jinja2 import BytecodeCache, FileSystemBytecodeCache
 import sqlite3
-import markdown
 from datetime import datetime, timedelta
+from functools import lru_cache
+from types import SimpleNamespace
 import os
 import io
+import stat
+import sys
+import json
+import base64
+import tempfile
+import threading
+import time
+import zlib
+from bisect import bisect_left
+from collections import Counter, OrderedDict, namedtuple
 from urllib.parse import quote
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, PageBreak
-from reportlab.lib.enums import TA_LEFT
-from reportlab.pdfbase import pdfmetrics
-from reportlab.pdfbase.ttfonts import TTFont
-from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+# Compiled templates are cached on disk so new workers skip Jinja compilation.
+# Cached bytecode is loaded with marshal, so JINJA_CACHE_DIR must be an existing
+# directory private to this user; when unset, Jinja's own per-user directory is used
+JINJA_CACHE_DIR = os.environ.get('JINJA_CACHE_DIR')
+
+
+def is_private_dir(path):
+    """Check that path is a directory owned by this user and closed to others"""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    if not stat.S_ISDIR(st.st_mode):
+        return False
+    if not hasattr(os, 'getuid'):
+        return True
+    return st.st_uid == os.getuid() and not st.st_mode & (stat.S_IRWXG | stat.S_IRWXO)
+
+
+def make_private_dir(path):
+    """Create path with mode 0o700 if missing, then check it is private"""
+    try:
+        os.mkdir(path, 0o700)
+    except FileExistsError:
+        pass
+    except OSError:
+        return False
+    return is_private_dir(path)
+
+
+class LazyBytecodeCache(BytecodeCache):
+    """
+    Bytecode cache that opens its directory on the first template load
+    Importing app.py creates no directories; if no safe directory is
+    available, templates are compiled without a cache
+    """
+    
+    def __init__(self, directory=None):
+        self.directory = directory
+        self._cache = None
+        self._ready = False
+        self._lock = threading.Lock()
+    
+    def _get_cache(self):
+        if not self._ready:
+            with self._lock:
+                if not self._ready:
+                    self._cache = self._open()
+                    self._ready = True
+        return self._cache
+    
+    def _open(self):
+        if self.directory:
+            if is_private_dir(self.directory):
+                return FileSystemBytecodeCache(self.directory)
+            app.logger.warning("JINJA_CACHE_DIR %s is not a private directory owned by this user; "
+                               "template bytecode caching is disabled", self.directory)
+            return None
+        try:
+            return FileSystemBytecodeCache()
+        except RuntimeError as e:
+            app.logger.warning("Template bytecode caching is disabled: %s", e)
+            return None
+    
+    def load_bytecode(self, bucket):
+        cache = self._get_cache()
+        if cache is not None:
+            cache.load_bytecode(bucket)
+    
+    def dump_bytecode(self, bucket):
+        cache = self._get_cache()
+        if cache is not None:
+            cache.dump_bytecode(bucket)
+    
+    def clear(self):
+        cache = self._get_cache()
+        if cache is not None:
+            cache.clear()
+
 
 app = Flask(__name__)
+# Must be set before the Jinja environment is created (first filter registration)
+app.jinja_options = dict(app.jinja_options, bytecode_cache=LazyBytecodeCache(JINJA_CACHE_DIR))
+# Templates hide server-only features (search, exports) when True; see build_static.py
+app.jinja_env.globals['static_site'] = False
 # Change this to a random secret key in production
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-key-please-change-in-production')
 
@@ -28,14 +116,191 @@ app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-key-please-change-i
 DATABASE = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'data', 'chat_history.db')
 ITEMS_PER_PAGE = 20
 
+# Search API configuration
+SEARCH_API_PAGE_SIZE = 20
+SEARCH_API_MAX_PAGE_SIZE = 100
+SEARCH_ROLES = ('user', 'assistant')
+
+# NDJSON bulk export configuration: rows fetched from SQLite per batch
+NDJSON_BATCH_SIZE = 1000
+
+# Search result cache configuration
+app.config['SEARCH_CACHE_MAX_ENTRIES'] = int(os.environ.get('SEARCH_CACHE_MAX_ENTRIES', '256'))
+app.config['SEARCH_CACHE_TTL'] = float(os.environ.get('SEARCH_CACHE_TTL', '300'))
+# Result sets larger than this are not cached to keep entries bounded
+app.config['SEARCH_CACHE_MAX_IDS'] = int(os.environ.get('SEARCH_CACHE_MAX_IDS', '10000'))
+# Total memory budget of the cache; least recently used entries are evicted to stay under it
+app.config['SEARCH_CACHE_MAX_MB'] = float(os.environ.get('SEARCH_CACHE_MAX_MB', '64'))
+
+# Per-request profiling (see profiling.py); nothing is installed unless enabled
+app.config['PROFILING_ENABLED'] = os.environ.get('PROFILING_ENABLED') == '1'
+app.config['PROFILING_SECRET'] = os.environ.get('PROFILING_SECRET', '')
+# Per-user default, like Jinja's bytecode cache; must be private or profiling stays off
+app.config['PROFILING_DIR'] = os.environ.get('PROFILING_DIR', os.path.join(
+    tempfile.gettempdir(),
+    f'chatgpt-viewer-profiles-{os.getuid()}' if hasattr(os, 'getuid') else 'chatgpt-viewer-profiles'
+))
+app.config['PROFILING_MAX_PROFILES'] = int(os.environ.get('PROFILING_MAX_PROFILES', '50'))
+
+# Connection class used by get_db(); replaced by a timing subclass when profiling
+db_connection_factory = sqlite3.Connection
+
+
+def estimate_size(value):
+    """
+    Approximate bytes held by a cached value built from dicts, lists, tuples
+    and scalars; shared objects are counted every time, so this errs high
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(estimate_size(item) for item in value)
+    return size
+
+
+class SearchCache:
+    """
+    Bounded LRU cache with a per-entry TTL for search results
+    Bounded both by entry count and by the estimated bytes of all entries.
+    Keys must include the import generation so a new ETL run never serves
+    stale results; hit/miss counters are exposed via stats()
+    """
+    
+    def __init__(self, max_entries, ttl, max_bytes):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                self._discard(key)
+            self.misses += 1
+            return None
+    
+    def put(self, key, value):
+        """
+        Store value under key, evicting the least recently used entries until
+        both the entry and byte limits hold; values over the byte budget are
+        not stored
+        """
+        if self.max_entries <= 0:
+            return
+        size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+    
+    def _discard(self, key):
+        """Remove key; the caller holds the lock"""
+        self._bytes -= self._entries.pop(key)[2]
+    
+    def clear(self):
+        """Drop all entries (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def stats(self):
+        """Return counters and limits as a dict"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0
+            }
+
+
+search_cache = SearchCache(app.config['SEARCH_CACHE_MAX_ENTRIES'], app.config['SEARCH_CACHE_TTL'],
+                           int(app.config['SEARCH_CACHE_MAX_MB'] * 1024 * 1024))
+
+# One ranked message hit of /api/search, ordered by (score, rowid)
+SearchHit = namedtuple('SearchHit', 'score rowid message_id conversation_id role create_time title')
+
 
 def get_db():
     """Get database connection"""
-    conn = sqlite3.connect(DATABASE)
+    conn = sqlite3.connect(DATABASE, factory=db_connection_factory)
     conn.row_factory = sqlite3.Row
     return conn
 
 
+@lru_cache(maxsize=None)
+def load_markdown():
+    """
+    Import the markdown package on first use
+    Keeps it out of worker startup; see preload_heavy_modules()
+    """
+    import markdown
+    return markdown
+
+
+@lru_cache(maxsize=None)
+def load_pdf_toolkit():
+    """
+    Import the reportlab pieces used by export_pdf() on first use
+    PDF export is rare, so workers should not pay for reportlab at startup
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+    from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer
+    from reportlab.lib.enums import TA_LEFT
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+    
+    return SimpleNamespace(
+        A4=A4,
+        getSampleStyleSheet=getSampleStyleSheet,
+        ParagraphStyle=ParagraphStyle,
+        SimpleDocTemplate=SimpleDocTemplate,
+        Paragraph=Paragraph,
+        Spacer=Spacer,
+        TA_LEFT=TA_LEFT,
+        pdfmetrics=pdfmetrics,
+        UnicodeCIDFont=UnicodeCIDFont
+    )
+
+
+def preload_heavy_modules():
+    """
+    Import markdown/reportlab and compile every template up front
+    Call this in a pre-forking server master (see gunicorn.conf.py) so the
+    loaded modules are shared copy-on-write by all workers
+    """
+    load_markdown()
+    load_pdf_toolkit()
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+
+
 def sanitize_filename(title, conversation_id, extension):
     """
     Sanitize filename by removing non-alphanumeric characters
@@ -48,6 +313,173 @@ def sanitize_filename(title, conversation_id, extension):
     return f"{safe_title}_{conversation_id[:8]}.{extension}"
 
 
+def get_import_generation(cursor):
+    """
+    Return a token identifying the database contents for cache keys
+    Generations restart at 1 in a rebuilt database, so the token also holds
+    the start time of the generation and the identity of the database file.
+    Failed runs count as finished (they may have committed some batches);
+    returns None only while an import is still running, meaning "do not cache"
+    """
+    try:
+        st = os.stat(DATABASE)
+        file_identity = (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+    except OSError:
+        file_identity = None
+    
+    try:
+        cursor.execute('''
+            SELECT generation, started_at, completed_at, failed_at
+            FROM imports
+            ORDER BY generation DESC
+            LIMIT 1
+        ''')
+    except sqlite3.OperationalError:
+        # Database predates the imports table; any new ETL run creates it
+        return (0, None, file_identity)
+    
+    latest = cursor.fetchone()
+    if latest is None:
+        return (0, None, file_identity)
+    if latest['completed_at'] is None and latest['failed_at'] is None:
+        return None
+    return (latest['generation'], latest['started_at'], file_identity)
+
+
+def get_completed_generation(cursor):
+    """
+    Return the newest import generation that finished (0 if none)
+    """
+    try:
+        cursor.execute('SELECT MAX(generation) FROM imports WHERE completed_at IS NOT NULL')
+    except sqlite3.OperationalError:
+        return 0
+    return cursor.fetchone()[0] or 0
+
+
+def parse_since(value):
+    """
+    Interpret a `since` argument for incremental exports
+    An integer is an import generation (rows written after it), anything else
+    an ISO date or datetime (rows created at or after it).
+    Returns (kind, value) with kind 'generation' or 'time', or None if invalid
+    """
+    if value.isdigit():
+        return 'generation', int(value)
+    try:
+        return 'time', datetime.fromisoformat(value).isoformat(sep=' ')
+    except ValueError:
+        return None
+
+
+def like_cache_key(query):
+    """
+    Normalise a LIKE search term for use in cache keys
+    SQLite's LIKE ignores case for ASCII letters only, so only those are folded
+    """
+    return ''.join(ch.lower() if ch.isascii() else ch for ch in query)
+
+
+def build_fts_query(query):
+    """
+    Turn free text into an FTS5 MATCH expression
+    Every term is quoted so user input cannot inject FTS syntax; terms are ANDed
+    """
+    return ' '.join('"{}"'.format(term.replace('"', '""')) for term in query.split())
+
+
+def split_tags(tags):
+    """Split a stored comma-separated tag string into a list"""
+    return [tag.strip() for tag in (tags or '').split(',') if tag.strip()]
+
+
+def parse_search_filters(args):
+    """
+    Read the role / date range / tag filters from request arguments
+    Returns (filters, error); dates are ISO dates and date_to is inclusive
+    """
+    filters = {}
+    
+    role = args.get('role', '').strip()
+    if role:
+        if role not in SEARCH_ROLES:
+            return None, f"Invalid role: {role}"
+        filters['role'] = role
+    
+    for name in ('date_from', 'date_to'):
+        value = args.get(name, '').strip()
+        if value:
+            try:
+                filters[name] = datetime.fromisoformat(value).date()
+            except ValueError:
+                return None, f"Invalid {name}: {value}"
+    
+    tag = args.get('tag', '').strip()
+    if tag:
+        filters['tag'] = tag
+    
+    return filters, None
+
+
+def search_snippets(cursor, query, language, limit, offset):
+    """
+    Search extracted code snippets by keyword and/or language
+    Keyword searches use the code_snippets_fts index ranked by relevance;
+    language-only listings use the language index, newest first.
+    Returns (rows, total_count)
+    """
+    conditions = []
+    params = []
+    
+    if query:
+        source = '''
+            code_snippets_fts
+            JOIN code_snippets s ON s.id = code_snippets_fts.rowid
+        '''
+        conditions.append('code_snippets_fts MATCH ?')
+        params.append(build_fts_query(query))
+        order_by = 'bm25(code_snippets_fts), s.id'
+    else:
+        source = 'code_snippets s'
+        order_by = 's.id DESC'
+    
+    if language:
+        conditions.append('s.language = ?')
+        params.append(language.lower())
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+    
+    cursor.execute(f'SELECT COUNT(*) FROM {source} {where}', params)
+    total_count = cursor.fetchone()[0]
+    
+    cursor.execute(f'''
+        SELECT s.id, s.message_id, s.language, s.code,
+               m.conversation_id, m.role, m.create_time, c.title
+        FROM {source}
+        JOIN messages m ON m.id = s.message_id
+        JOIN conversations c ON c.id = m.conversation_id
+        {where}
+        ORDER BY {order_by}
+        LIMIT ? OFFSET ?
+    ''', params + [limit, offset])
+    
+    return cursor.fetchall(), total_count
+
+
+def encode_cursor(score, rowid):
+    """Encode a (score, rowid) keyset position as an opaque cursor"""
+    return base64.urlsafe_b64encode(json.dumps([score, rowid]).encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor(); returns None if malformed"""
+    try:
+        score, rowid = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return float(score), int(rowid)
+    except (ValueError, TypeError):
+        return None
+
+
 @app.template_filter('markdown')
 def markdown_filter(text):
     """
@@ -58,7 +490,7 @@ def markdown_filter(text):
         return ""
     
     # Configure markdown with extensions
-    md = markdown.Markdown(extensions=[
+    md = load_markdown().Markdown(extensions=[
         'fenced_code',
         'codehilite',
         'tables',
@@ -100,28 +532,42 @@ def index():
     
     # Build query based on search
     if query:
-        # Count total for pagination first
-        search_pattern = f'%{query}%'
-        count_sql = '''
-            SELECT COUNT(DISTINCT c.id)
-            FROM conversations c
-            LEFT JOIN messages m ON c.id = m.conversation_id
-            WHERE c.title LIKE ? OR m.content LIKE ?
-        '''
-        cursor.execute(count_sql, (search_pattern, search_pattern))
-        total_count = cursor.fetchone()[0]
+        # The ordered list of matching ids doubles as the total count, and is
+        # cached so later pages and repeated queries skip the full scan
+        generation = get_import_generation(cursor)
+        cache_key = ('index', like_cache_key(query), generation)
+        matching_ids = search_cache.get(cache_key) if generation is not None else None
         
-        # Search in title AND message content
-        search_sql = '''
-            SELECT DISTINCT c.id, c.title, c.create_time, c.tags, c.total_char_count
-            FROM conversations c
-            LEFT JOIN messages m ON c.id = m.conversation_id
-            WHERE c.title LIKE ? OR m.content LIKE ?
-            ORDER BY c.create_time DESC
-            LIMIT ? OFFSET ?
-        '''
-        cursor.execute(search_sql, (search_pattern, search_pattern, ITEMS_PER_PAGE, offset))
-        conversations = cursor.fetchall()
+        if matching_ids is None:
+            # Search in title AND message content
+            search_pattern = f'%{query}%'
+            cursor.execute('''
+                SELECT c.id
+                FROM conversations c
+                WHERE c.title LIKE ?
+                   OR EXISTS (SELECT 1 FROM messages m
+                              WHERE m.conversation_id = c.id AND m.content LIKE ?)
+                ORDER BY c.create_time DESC
+            ''', (search_pattern, search_pattern))
+            matching_ids = tuple(row[0] for row in cursor.fetchall())
+            
+            if generation is not None and len(matching_ids) <= app.config['SEARCH_CACHE_MAX_IDS']:
+                search_cache.put(cache_key, matching_ids)
+        
+        total_count = len(matching_ids)
+        start = max(offset, 0)
+        page_ids = matching_ids[start:start + ITEMS_PER_PAGE]
+        
+        conversations = []
+        if page_ids:
+            placeholders = ', '.join('?' for _ in page_ids)
+            cursor.execute(f'''
+                SELECT id, title, create_time, tags, total_char_count
+                FROM conversations
+                WHERE id IN ({placeholders})
+            ''', page_ids)
+            rows = {row['id']: row for row in cursor.fetchall()}
+            conversations = [rows[conv_id] for conv_id in page_ids if conv_id in rows]
     else:
         # Count total first
         cursor.execute('SELECT COUNT(*) FROM conversations')
@@ -218,6 +664,441 @@ def contribution_data():
     return jsonify(data)
 
 
+@app.route('/api/search')
+def api_search():
+    """
+    API endpoint: Ranked full-text search over messages
+    Query parameters: q (required), role, date_from, date_to, tag, limit, cursor.
+    The first page aggregates the total, facet counts (messages per role, tag
+    and month) and per-conversation hits in the same pass over the FTS matches
+    that fills the page, and caches the ordered hits; cursor pages are served
+    from that cache or by a keyset query, and return only messages.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({'error': 'Missing query parameter: q'}), 400
+    
+    filters, error = parse_search_filters(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    limit = request.args.get('limit', SEARCH_API_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, SEARCH_API_MAX_PAGE_SIZE))
+    
+    after = None
+    cursor_param = request.args.get('cursor', '').strip()
+    if cursor_param:
+        after = decode_cursor(cursor_param)
+        if after is None:
+            return jsonify({'error': 'Invalid cursor'}), 400
+    
+    fts_query = build_fts_query(query)
+    conditions = ['messages_fts MATCH ?']
+    params = [fts_query]
+    
+    if 'role' in filters:
+        conditions.append('m.role = ?')
+        params.append(filters['role'])
+    if 'date_from' in filters:
+        conditions.append('m.create_time >= ?')
+        params.append(filters['date_from'].isoformat())
+    if 'date_to' in filters:
+        conditions.append('m.create_time < ?')
+        params.append((filters['date_to'] + timedelta(days=1)).isoformat())
+    if 'tag' in filters:
+        # Tags are stored as "A, B, C"; pad so only whole tags match
+        conditions.append("(', ' || c.tags || ', ') LIKE ?")
+        params.append(f"%, {filters['tag']}, %")
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    generation = get_import_generation(cursor)
+    cache_key = ('api', fts_query.lower(), tuple(sorted((name, str(value)) for name, value in filters.items())),
+                 generation)
+    cached = search_cache.get(cache_key) if generation is not None else None
+    
+    # Totals, facets and conversation hits describe the whole result set and
+    # are only returned with the first page (no cursor)
+    summary = None
+    
+    if cached is not None:
+        # Hits compare by (score, rowid) first and rowids are unique, so the
+        # first hit after the cursor is found by binary search
+        start = bisect_left(cached['hits'], (after[0], after[1] + 1)) if after is not None else 0
+        page_rows = cached['hits'][start:start + limit + 1]
+        if after is None:
+            summary = cached['summary']
+    elif after is not None:
+        # Later pages: SQLite applies the keyset predicate and keeps only the
+        # next limit + 1 rows while sorting, with no per-match work in Python
+        cursor.execute(f'''
+            SELECT m.rowid AS rowid, m.id, m.conversation_id, m.role, m.create_time,
+                   c.title, bm25(messages_fts) AS score
+            FROM messages_fts
+            JOIN messages m ON m.rowid = messages_fts.rowid
+            JOIN conversations c ON c.id = m.conversation_id
+            WHERE {' AND '.join(conditions)}
+              AND (score > ? OR (score = ? AND m.rowid > ?))
+            ORDER BY score, m.rowid
+            LIMIT ?
+        ''', params + [after[0], after[0], after[1], limit + 1])
+        page_rows = [SearchHit(row['score'], row['rowid'], row['id'], row['conversation_id'],
+                               row['role'], row['create_time'], row['title'])
+                     for row in cursor.fetchall()]
+    else:
+        cursor.execute(f'''
+            SELECT m.rowid AS rowid, m.id, m.conversation_id, m.role, m.create_time,
+                   c.title, c.tags, c.create_time AS conversation_create_time,
+                   bm25(messages_fts) AS score
+            FROM messages_fts
+            JOIN messages m ON m.rowid = messages_fts.rowid
+            JOIN conversations c ON c.id = m.conversation_id
+            WHERE {' AND '.join(conditions)}
+            ORDER BY score, m.rowid
+        ''', params)
+        
+        total = 0
+        role_counts = Counter()
+        tag_counts = Counter()
+        month_counts = Counter()
+        conversation_hits = {}
+        page_rows = []
+        # Every hit is kept for the cache unless the result set is too large
+        all_hits = [] if generation is not None else None
+        max_hits = app.config['SEARCH_CACHE_MAX_IDS']
+        
+        for row in cursor:
+            total += 1
+            role_counts[row['role']] += 1
+            for tag in split_tags(row['tags']):
+                tag_counts[tag] += 1
+            if row['create_time']:
+                month_counts[row['create_time'][:7]] += 1
+            
+            # Rows arrive best-first, so the first hit per conversation is its best
+            hit = conversation_hits.get(row['conversation_id'])
+            if hit is None:
+                conversation_hits[row['conversation_id']] = {
+                    'conversation_id': row['conversation_id'],
+                    'title': row['title'],
+                    'tags': split_tags(row['tags']),
+                    'create_time': row['conversation_create_time'],
+                    'score': row['score'],
+                    'hits': 1
+                }
+            else:
+                hit['hits'] += 1
+            
+            search_hit = SearchHit(row['score'], row['rowid'], row['id'], row['conversation_id'],
+                                   row['role'], row['create_time'], row['title'])
+            if all_hits is not None:
+                all_hits.append(search_hit)
+                if len(all_hits) > max_hits:
+                    all_hits = None
+            
+            # Keep one row beyond the page to detect whether another page exists
+            if len(page_rows) <= limit:
+                page_rows.append(search_hit)
+        
+        summary = {
+            'total': total,
+            'total_conversations': len(conversation_hits),
+            'facets': {
+                'role': dict(role_counts),
+                'tag': dict(tag_counts.most_common()),
+                'month': dict(sorted(month_counts.items()))
+            },
+            # Best conversations only, enough for the largest page size
+            'conversations': list(conversation_hits.values())[:SEARCH_API_MAX_PAGE_SIZE]
+        }
+        
+        if all_hits is not None:
+            search_cache.put(cache_key, {'hits': all_hits, 'summary': summary})
+    
+    next_cursor = None
+    if len(page_rows) > limit:
+        page_rows = page_rows[:limit]
+        last = page_rows[-1]
+        next_cursor = encode_cursor(last.score, last.rowid)
+    
+    # Snippets are only generated for the rows actually returned
+    snippets = {}
+    if page_rows:
+        placeholders = ', '.join('?' for _ in page_rows)
+        cursor.execute(f'''
+            SELECT rowid, snippet(messages_fts, 0, '<mark>', '</mark>', '…', 16)
+            FROM messages_fts
+            WHERE messages_fts MATCH ? AND rowid IN ({placeholders})
+        ''', [fts_query] + [hit.rowid for hit in page_rows])
+        snippets = dict(cursor.fetchall())
+    
+    conn.close()
+    
+    messages = [{
+        'message_id': hit.message_id,
+        'conversation_id': hit.conversation_id,
+        'title': hit.title,
+        'role': hit.role,
+        'create_time': hit.create_time,
+        'score': hit.score,
+        'snippet': snippets.get(hit.rowid, '')
+    } for hit in page_rows]
+    
+    result = {
+        'query': query,
+        'filters': {name: str(value) for name, value in filters.items()},
+        'total': None,
+        'total_conversations': None,
+        'facets': None,
+        'messages': messages,
+        'conversations': None,
+        'next_cursor': next_cursor
+    }
+    if summary is not None:
+        result.update(summary, conversations=summary['conversations'][:limit])
+    
+    return jsonify(result)
+
+
+@app.route('/snippets')
+def snippets():
+    """
+    Code snippets page: Search fenced code blocks by keyword and language
+    """
+    page = request.args.get('page', 1, type=int)
+    query = request.args.get('q', '').strip()
+    language = request.args.get('language', '').strip()
+    
+    offset = max(page - 1, 0) * ITEMS_PER_PAGE
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    
+    code_snippets, total_count = search_snippets(cursor, query, language, ITEMS_PER_PAGE, offset)
+    
+    # Language list for the filter dropdown (served from the language index)
+    cursor.execute('''
+        SELECT language, COUNT(*) as count
+        FROM code_snippets
+        WHERE language != ''
+        GROUP BY language
+        ORDER BY count DESC
+    ''')
+    languages = cursor.fetchall()
+    
+    conn.close()
+    
+    total_pages = (total_count + ITEMS_PER_PAGE - 1) // ITEMS_PER_PAGE
+    
+    return render_template('snippets.html',
+                         snippets=code_snippets,
+                         languages=languages,
+                         page=page,
+                         total_pages=total_pages,
+                         query=query,
+                         language=language,
+                         total_count=total_count)
+
+
+@app.route('/api/snippets')
+def api_snippets():
+    """
+    API endpoint: Search code snippets
+    Query parameters: q, language, limit, offset
+    """
+    query = request.args.get('q', '').strip()
+    language = request.args.get('language', '').strip()
+    limit = request.args.get('limit', SEARCH_API_PAGE_SIZE, type=int)
+    limit = max(1, min(limit, SEARCH_API_MAX_PAGE_SIZE))
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    rows, total_count = search_snippets(cursor, query, language, limit, offset)
+    conn.close()
+    
+    return jsonify({
+        'query': query,
+        'language': language,
+        'total': total_count,
+        'snippets': [{
+            'id': row['id'],
+            'message_id': row['message_id'],
+            'conversation_id': row['conversation_id'],
+            'title': row['title'],
+            'role': row['role'],
+            'create_time': row['create_time'],
+            'language': row['language'],
+            'code': row['code']
+        } for row in rows]
+    })
+
+
+def ndjson_response(conn, cursor, serialize):
+    """
+    Stream the rows of an executed query as newline-delimited JSON
+    Rows are pulled with fetchmany() so memory stays flat however large the
+    result; with ?gzip=1 the stream is gzip-compressed on the fly
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if request.args.get('gzip') == '1' else None
+    
+    def generate():
+        try:
+            while True:
+                rows = cursor.fetchmany(NDJSON_BATCH_SIZE)
+                if not rows:
+                    break
+                chunk = ''.join(json.dumps(serialize(row), ensure_ascii=False) + '\n' for row in rows).encode('utf-8')
+                if compressor:
+                    chunk = compressor.compress(chunk)
+                if chunk:
+                    yield chunk
+            if compressor:
+                yield compressor.flush()
+        finally:
+            conn.close()
+    
+    response = Response(generate(), mimetype='application/x-ndjson')
+    if compressor:
+        response.headers['Content-Encoding'] = 'gzip'
+    # Ensure the connection is released even if streaming never starts
+    response.call_on_close(conn.close)
+    return response
+
+
+def parse_export_filters(args):
+    """
+    Read the since / date range / tag filters of the NDJSON exports
+    Returns (since, filters, error)
+    """
+    filters, error = parse_search_filters(args)
+    if error:
+        return None, None, error
+    
+    since = None
+    since_param = args.get('since', '').strip()
+    if since_param:
+        since = parse_since(since_param)
+        if since is None:
+            return None, None, f"Invalid since: {since_param}"
+    
+    return since, filters, None
+
+
+def build_export_conditions(alias, since, filters, generation):
+    """
+    Build WHERE conditions for an NDJSON export over the table aliased `alias`
+    Rows written by imports newer than `generation` (the newest completed one,
+    sent as X-Import-Generation) are left out, so consumers never store rows
+    of a running or failed import. The tag filter always applies to the
+    conversations table aliased c
+    """
+    # Rows of databases not re-imported since generations were added are NULL
+    conditions = [f'({alias}.import_generation <= ? OR {alias}.import_generation IS NULL)']
+    params = [generation]
+    
+    if since is not None:
+        kind, value = since
+        if kind == 'generation':
+            conditions.append(f'{alias}.import_generation > ?')
+        else:
+            conditions.append(f'{alias}.create_time >= ?')
+        params.append(value)
+    
+    if 'date_from' in filters:
+        conditions.append(f'{alias}.create_time >= ?')
+        params.append(filters['date_from'].isoformat())
+    if 'date_to' in filters:
+        conditions.append(f'{alias}.create_time < ?')
+        params.append((filters['date_to'] + timedelta(days=1)).isoformat())
+    if 'tag' in filters:
+        conditions.append("(', ' || c.tags || ', ') LIKE ?")
+        params.append(f"%, {filters['tag']}, %")
+    
+    return f"WHERE {' AND '.join(conditions)}", params
+
+
+@app.route('/api/conversations.ndjson')
+def export_conversations_ndjson():
+    """
+    API endpoint: Stream every conversation as NDJSON
+    Query parameters: since (import generation or ISO timestamp), date_from,
+    date_to, tag, gzip. X-Import-Generation carries the newest completed
+    import generation to pass as `since` on the next incremental pull
+    """
+    since, filters, error = parse_export_filters(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    generation = get_completed_generation(cursor)
+    
+    where, params = build_export_conditions('c', since, filters, generation)
+    
+    cursor.execute(f'''
+        SELECT c.id, c.title, c.create_time, c.tags, c.total_char_count, c.import_generation
+        FROM conversations c
+        {where}
+    ''', params)
+    
+    response = ndjson_response(conn, cursor, lambda row: {
+        'id': row['id'],
+        'title': row['title'],
+        'create_time': row['create_time'],
+        'tags': split_tags(row['tags']),
+        'total_char_count': row['total_char_count'],
+        'import_generation': row['import_generation']
+    })
+    response.headers['X-Import-Generation'] = str(generation)
+    return response
+
+
+@app.route('/api/messages.ndjson')
+def export_messages_ndjson():
+    """
+    API endpoint: Stream every message as NDJSON
+    Query parameters: since (import generation or ISO timestamp), role,
+    date_from, date_to, tag, gzip. X-Import-Generation carries the newest
+    completed import generation to pass as `since` on the next incremental pull
+    """
+    since, filters, error = parse_export_filters(request.args)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    conn = get_db()
+    cursor = conn.cursor()
+    generation = get_completed_generation(cursor)
+    
+    where, params = build_export_conditions('m', since, filters, generation)
+    if 'role' in filters:
+        where = f"{where} AND m.role = ?"
+        params.append(filters['role'])
+    
+    # The conversations join is only needed to filter by tag
+    join = 'JOIN conversations c ON c.id = m.conversation_id' if 'tag' in filters else ''
+    
+    cursor.execute(f'''
+        SELECT m.id, m.conversation_id, m.role, m.content, m.create_time, m.import_generation
+        FROM messages m
+        {join}
+        {where}
+    ''', params)
+    
+    response = ndjson_response(conn, cursor, dict)
+    response.headers['X-Import-Generation'] = str(generation)
+    return response
+
+
+@app.route('/api/cache_stats')
+def cache_stats():
+    """
+    API endpoint: Search cache counters and limits
+    """
+    return jsonify(search_cache.stats())
+
+
 @app.route('/stats')
 def stats():
     """
@@ -423,11 +1304,13 @@ def export_pdf(conversation_id):
     messages = cursor.fetchall()
     conn.close()
     
+    pdf = load_pdf_toolkit()
+    
     # Create PDF in memory
     buffer = io.BytesIO()
     
     # Create the PDF document
-    doc = SimpleDocTemplate(buffer, pagesize=A4,
+    doc = pdf.SimpleDocTemplate(buffer, pagesize=pdf.A4,
                            rightMargin=72, leftMargin=72,
                            topMargin=72, bottomMargin=18)
     
@@ -436,27 +1319,27 @@ def export_pdf(conversation_id):
     
     # Register CJK font for Chinese characters
     try:
-        pdfmetrics.registerFont(UnicodeCIDFont('STSong-Light'))
+        pdf.pdfmetrics.registerFont(pdf.UnicodeCIDFont('STSong-Light'))
         font_name = 'STSong-Light'
     except (ImportError, KeyError, RuntimeError):
         # Fallback to default font if CJK font not available
         font_name = 'Helvetica'
     
     # Define styles
-    styles = getSampleStyleSheet()
+    styles = pdf.getSampleStyleSheet()
     
     # Title style
-    title_style = ParagraphStyle(
+    title_style = pdf.ParagraphStyle(
         'CustomTitle',
         parent=styles['Heading1'],
         fontSize=16,
         fontName=font_name,
         spaceAfter=12,
-        alignment=TA_LEFT
+        alignment=pdf.TA_LEFT
     )
     
     # Metadata style
-    meta_style = ParagraphStyle(
+    meta_style = pdf.ParagraphStyle(
         'CustomMeta',
         parent=styles['Normal'],
         fontSize=10,
@@ -466,7 +1349,7 @@ def export_pdf(conversation_id):
     )
     
     # Message header style
-    msg_header_style = ParagraphStyle(
+    msg_header_style = pdf.ParagraphStyle(
         'MessageHeader',
         parent=styles['Heading2'],
         fontSize=12,
@@ -476,7 +1359,7 @@ def export_pdf(conversation_id):
     )
     
     # Message content style
-    msg_content_style = ParagraphStyle(
+    msg_content_style = pdf.ParagraphStyle(
         'MessageContent',
         parent=styles['Normal'],
         fontSize=10,
@@ -486,9 +1369,9 @@ def export_pdf(conversation_id):
     )
     
     # Add title
-    title = Paragraph(conversation['title'] or '無標題對話', title_style)
+    title = pdf.Paragraph(conversation['title'] or '無標題對話', title_style)
     elements.append(title)
-    elements.append(Spacer(1, 12))
+    elements.append(pdf.Spacer(1, 12))
     
     # Add metadata
     meta_lines = [
@@ -501,9 +1384,9 @@ def export_pdf(conversation_id):
         meta_lines.append(f"標籤: {conversation['tags']}")
     
     for line in meta_lines:
-        elements.append(Paragraph(line, meta_style))
+        elements.append(pdf.Paragraph(line, meta_style))
     
-    elements.append(Spacer(1, 24))
+    elements.append(pdf.Spacer(1, 24))
     
     # Add messages
     for message in messages:
@@ -511,7 +1394,7 @@ def export_pdf(conversation_id):
         
         # Message header
         header_text = f"{role_name} - {message['create_time']}"
-        elements.append(Paragraph(header_text, msg_header_style))
+        elements.append(pdf.Paragraph(header_text, msg_header_style))
         
         # Message content (escape HTML special characters and handle long text)
         content = message['content'] or ""
@@ -522,12 +1405,12 @@ def export_pdf(conversation_id):
             content = content[:5000] + "...(內容過長，已截斷)"
         
         try:
-            elements.append(Paragraph(content, msg_content_style))
+            elements.append(pdf.Paragraph(content, msg_content_style))
         except (ValueError, AttributeError):
             # If content causes issues, use a simplified version
-            elements.append(Paragraph("[內容無法正確顯示]", msg_content_style))
+            elements.append(pdf.Paragraph("[內容無法正確顯示]", msg_content_style))
         
-        elements.append(Spacer(1, 12))
+        elements.append(pdf.Spacer(1, 12))
     
     # Build PDF
     try:
@@ -561,6 +1444,23 @@ def internal_error(e):
     return render_template('500.html'), 500
 
 
+# Opt-in per-request profiling; requires a secret so it cannot be triggered openly
+# Profiles reveal queries and timings, so they are only written to a private directory
+if app.config['PROFILING_ENABLED'] and app.config['PROFILING_SECRET']:
+    if make_private_dir(app.config['PROFILING_DIR']):
+        from profiling import ProfiledConnection, install_profiling
+        install_profiling(app)
+        db_connection_factory = ProfiledConnection
+    else:
+        app.logger.warning("PROFILING_DIR %s is not a private directory owned by this user; "
+                           "profiling is disabled", app.config['PROFILING_DIR'])
+
+
+# Opt-in eager loading for pre-forking servers (enabled by gunicorn.conf.py)
+if os.environ.get('PRELOAD_HEAVY_MODULES') == '1':
+    preload_heavy_modules()
+
+
 if __name__ == '__main__':
     import os
     
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Import Memory Benchmark for ChatGPT Conversation History
+Generates a synthetic export (by default one conversation with 100k messages),
+imports it with etl_script.py in a fresh interpreter and fails if the peak RSS
+of that process exceeds the configured ceiling. Peak RSS covers everything the
+importer holds: Python objects, SQLite's page cache and the ijson parser
+buffers. Where the resource module is unavailable (Windows) only the Python
+heap is measured, with tracemalloc
+"""
+
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+
+
+WORDS = ('python sql flask data query index code table select join web html '
+         'model train deploy cache stream parse memory server client test').split()
+TITLES = ('Python tips', 'SQL data question', 'Flask web app', 'Machine learning notes',
+          'Daily chat', 'Database design', 'HTML and CSS layout')
+
+
+def synthetic_message(rng, index, message_chars):
+    """
+    Build one synthetic message body; every third one carries a code block
+    """
+    words = []
+    length = 0
+    while length < message_chars:
+        word = rng.choice(WORDS)
+        words.append(word)
+        length += len(word) + 1
+    text = ' '.join(words)
+
+    if index % 3 == 0:
+        text += f"\n```sql\nSELECT id, title FROM conversations WHERE id = {index};\n```\n"
+    return text
+
+
+def write_synthetic_export(path, conversations=1, messages_per_conversation=100000,
+                           message_chars=200, seed=42, start_time=1700000000):
+    """
+    Write a synthetic conversations.json export to path
+    The file is written incrementally so arbitrarily large exports can be
+    produced; key order follows real ChatGPT exports ('id' after 'mapping')
+    """
+    rng = random.Random(seed)
+
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('[')
+        for conv_index in range(conversations):
+            if conv_index:
+                f.write(',')
+            conv_time = start_time + conv_index * 3600
+            title = f"{rng.choice(TITLES)} {conv_index}"
+            f.write(f'{{"title": {json.dumps(title)}, "create_time": {conv_time}, "mapping": {{')
+
+            for msg_index in range(messages_per_conversation):
+                if msg_index:
+                    f.write(',')
+                node_id = f"node-{conv_index}-{msg_index}"
+                node = {
+                    'id': node_id,
+                    'message': {
+                        'id': f"msg-{conv_index}-{msg_index}",
+                        'author': {'role': 'user' if msg_index % 2 == 0 else 'assistant'},
+                        'create_time': conv_time + msg_index,
+                        'content': {'content_type': 'text',
+                                    'parts': [synthetic_message(rng, msg_index, message_chars)]}
+                    },
+                    'parent': f"node-{conv_index}-{msg_index - 1}" if msg_index else None,
+                    'children': [f"node-{conv_index}-{msg_index + 1}"]
+                }
+                f.write(f'{json.dumps(node_id)}: {json.dumps(node)}')
+
+            f.write(f'}}, "current_node": null, "id": "conv-{conv_index:06d}"}}')
+        f.write(']')
+
+
+# Runs in a fresh interpreter so the peak RSS belongs to the import alone
+PROBE = '''
+import contextlib, json, sys, time
+from etl_script import create_database, parse_and_insert
+json_path, db_path, batch_size, max_buffer_mb = sys.argv[1], sys.argv[2], int(sys.argv[3]), float(sys.argv[4])
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def rss_mb():
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024
+
+with contextlib.redirect_stdout(sys.stderr):
+    create_database(db_path)
+    if resource is not None:
+        baseline = rss_mb()
+    else:
+        import tracemalloc
+        tracemalloc.start()
+    start = time.perf_counter()
+    parse_and_insert(json_path, db_path, batch_size=batch_size, max_buffer_mb=max_buffer_mb)
+    elapsed = time.perf_counter() - start
+
+if resource is not None:
+    result = {'measure': 'peak_rss', 'baseline_mb': baseline, 'peak_mb': rss_mb()}
+else:
+    result = {'measure': 'python_heap', 'baseline_mb': 0.0, 'peak_mb': tracemalloc.get_traced_memory()[1] / 1024 / 1024}
+result['seconds'] = elapsed
+print(json.dumps(result))
+'''
+
+
+def measure_import(json_path, db_path, batch_size, max_buffer_mb):
+    """
+    Import json_path into db_path in a fresh interpreter and return its
+    measurements (the importer's progress output is discarded)
+    """
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    output = subprocess.run(
+        [sys.executable, '-c', PROBE, json_path, db_path, str(batch_size), str(max_buffer_mb)],
+        cwd=src_dir, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True
+    ).stdout
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    """
+    Main entry point for the import memory benchmark
+    """
+    parser = argparse.ArgumentParser(description='Verify the importer stays under a memory ceiling')
+    parser.add_argument('--conversations', type=int, default=1)
+    parser.add_argument('--messages', type=int, default=100000, help='messages per conversation')
+    parser.add_argument('--message-chars', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=5000, help='importer row budget')
+    parser.add_argument('--max-buffer-mb', type=float, default=8, help='importer byte budget')
+    parser.add_argument('--ceiling-mb', type=float, default=48,
+                        help='fail if the peak RSS of the importing process exceeds this')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        json_path = os.path.join(tmp_dir, 'conversations.json')
+        db_path = os.path.join(tmp_dir, 'chat_history.db')
+
+        write_synthetic_export(json_path, args.conversations, args.messages, args.message_chars)
+        measured = measure_import(json_path, db_path, args.batch_size, args.max_buffer_mb)
+
+        result = {
+            'json_mb': round(os.path.getsize(json_path) / 1024 / 1024, 2),
+            'conversations': args.conversations,
+            'messages_per_conversation': args.messages,
+            'seconds': round(measured['seconds'], 2),
+            'measure': measured['measure'],
+            'baseline_mb': round(measured['baseline_mb'], 2),
+            'peak_mb': round(measured['peak_mb'], 2),
+            'ceiling_mb': args.ceiling_mb
+        }
+
+    print(json.dumps(result, indent=2))
+
+    if result['measure'] == 'python_heap':
+        print("⚠ resource module unavailable: only the Python heap was measured")
+    if result['peak_mb'] > args.ceiling_mb:
+        print(f"✗ Peak memory {result['peak_mb']} MB exceeds ceiling {args.ceiling_mb} MB")
+        sys.exit(1)
+    print("✓ Import stayed under the memory ceiling")
+
+
+if __name__ == '__main__':
+    main()
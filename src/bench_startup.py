@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Startup Benchmark for ChatGPT Conversation Viewer
+Measures how long importing app.py takes and the resulting RSS of a fresh
+worker process, with lazy heavy imports (default) and with preloading
+"""
+
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+
+# Runs in a fresh interpreter so every sample is a cold worker start
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import app
+elapsed = time.perf_counter() - start
+try:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    rss_mb = rss / 1024 / 1024 if sys.platform == 'darwin' else rss / 1024
+except ImportError:
+    rss_mb = None
+print(json.dumps({'import_ms': elapsed * 1000, 'rss_mb': rss_mb,
+                  'reportlab_loaded': 'reportlab' in sys.modules,
+                  'markdown_loaded': 'markdown' in sys.modules}))
+'''
+
+MODES = {
+    'lazy': {'PRELOAD_HEAVY_MODULES': '0'},
+    'preload': {'PRELOAD_HEAVY_MODULES': '1'}
+}
+
+
+def measure(mode, runs):
+    """
+    Start `runs` fresh interpreters importing app.py and summarise them
+    """
+    env = dict(os.environ, **MODES[mode])
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    samples = []
+    
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', PROBE], cwd=src_dir, env=env,
+                                stdout=subprocess.PIPE, check=True).stdout
+        samples.append(json.loads(output.decode().strip().splitlines()[-1]))
+    
+    rss_values = [s['rss_mb'] for s in samples if s['rss_mb'] is not None]
+    return {
+        'runs': runs,
+        'import_ms_median': round(statistics.median(s['import_ms'] for s in samples), 2),
+        'import_ms_min': round(min(s['import_ms'] for s in samples), 2),
+        'rss_mb_median': round(statistics.median(rss_values), 2) if rss_values else None,
+        'reportlab_loaded': samples[0]['reportlab_loaded'],
+        'markdown_loaded': samples[0]['markdown_loaded']
+    }
+
+
+def main():
+    """
+    Main entry point for the startup benchmark
+    """
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    
+    results = {mode: measure(mode, runs) for mode in MODES}
+    lazy, preload = results['lazy'], results['preload']
+    results['saved_import_ms'] = round(preload['import_ms_median'] - lazy['import_ms_median'], 2)
+    if lazy['rss_mb_median'] is not None:
+        results['saved_rss_mb'] = round(preload['rss_mb_median'] - lazy['rss_mb_median'], 2)
+    
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
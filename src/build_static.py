@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Static Site Builder for ChatGPT Conversation Viewer
+Pre-renders the conversation pages, paginated list pages, stats page and
+contribution data into a directory that any static web server can serve.
+Conversation pages are rendered in parallel and rebuilt incrementally:
+only conversations whose content hash changed since the last build are
+re-rendered
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import quote
+
+import app as viewer
+
+
+MANIFEST_NAME = '.build-manifest.json'
+# Conversations rendered per worker task
+CHUNK_SIZE = 200
+# Conversation ids become directory names; other ids are published under a
+# hashed name starting with '~', which no plain id can produce
+SAFE_ID_RE = re.compile(r'^[A-Za-z0-9_-]+$')
+
+_base_url = ''
+
+
+def page_id(conversation_id):
+    """
+    Directory name of a conversation page: the id itself when it is a plain
+    id, otherwise a stable hash of it
+    """
+    if SAFE_ID_RE.match(conversation_id):
+        return conversation_id
+    return '~' + hashlib.sha256(conversation_id.encode('utf-8')).hexdigest()[:32]
+
+
+def static_url_for(endpoint, **values):
+    """
+    url_for() replacement that links to the pre-rendered file layout
+    """
+    if endpoint == 'index':
+        page = values.get('page', 1)
+        return f"{_base_url}/" if page <= 1 else f"{_base_url}/page/{page}/"
+    if endpoint == 'chat_detail':
+        return f"{_base_url}/chat/{page_id(values['conversation_id'])}/"
+    if endpoint == 'stats':
+        return f"{_base_url}/stats/"
+    if endpoint == 'contribution_data':
+        return f"{_base_url}/api/contribution_data.json"
+    return viewer.url_for(endpoint, **values)
+
+
+def init_renderer(db_path, base_url):
+    """
+    Point the Flask app at the database and switch templates to static mode
+    Runs in the main process and as the initializer of every worker
+    """
+    global _base_url
+    _base_url = base_url.rstrip('/')
+    viewer.DATABASE = db_path
+    viewer.app.jinja_env.globals['static_site'] = True
+    viewer.app.jinja_env.globals['url_for'] = static_url_for
+
+
+def render_view(endpoint, path, **view_args):
+    """
+    Render a view of the Flask app as it would answer a request for path
+    """
+    with viewer.app.test_request_context(path):
+        result = viewer.app.view_functions[endpoint](**view_args)
+    if isinstance(result, str):
+        return result.encode('utf-8')
+    return result.get_data()
+
+
+def write_file(output_dir, relative_path, data):
+    """
+    Write data to output_dir/relative_path, creating directories as needed
+    """
+    path = os.path.join(output_dir, *relative_path.split('/'))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def render_conversations(output_dir, conversation_ids):
+    """
+    Worker task: render the detail page of each conversation in the chunk
+    """
+    for conv_id in conversation_ids:
+        html = render_view('chat_detail', f"/chat/{quote(conv_id, safe='')}", conversation_id=conv_id)
+        write_file(output_dir, f'chat/{page_id(conv_id)}/index.html', html)
+    return len(conversation_ids)
+
+
+def render_list_pages(output_dir, pages):
+    """
+    Worker task: render the given pages of the conversation list
+    """
+    for page in pages:
+        html = render_view('index', f'/?page={page}')
+        write_file(output_dir, 'index.html' if page == 1 else f'page/{page}/index.html', html)
+    return len(pages)
+
+
+def conversation_hashes(db_path):
+    """
+    Return {conversation_id: content hash} over each conversation's metadata
+    and messages; messages are read in index order, without a full sort
+    """
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    hashes = {}
+    cursor.execute('SELECT id, title, create_time, tags, total_char_count FROM conversations')
+    for row in cursor:
+        hashes[row[0]] = hashlib.sha256(json.dumps(row, ensure_ascii=False).encode('utf-8'))
+
+    cursor.execute('''
+        SELECT conversation_id, id, role, create_time, content
+        FROM messages
+        ORDER BY conversation_id
+    ''')
+    for row in cursor:
+        digest = hashes.get(row[0])
+        if digest is not None:
+            digest.update(json.dumps(row[1:], ensure_ascii=False).encode('utf-8'))
+
+    conn.close()
+    return {conv_id: digest.hexdigest() for conv_id, digest in hashes.items()}
+
+
+def templates_hash():
+    """
+    Hash the templates and this builder so layout changes force a full rebuild
+    """
+    digest = hashlib.sha256()
+    src_dir = os.path.dirname(os.path.abspath(__file__))
+    template_dir = os.path.join(src_dir, 'templates')
+    for name in sorted(os.listdir(template_dir)):
+        with open(os.path.join(template_dir, name), 'rb') as f:
+            digest.update(name.encode('utf-8') + f.read())
+    with open(os.path.abspath(__file__), 'rb') as f:
+        digest.update(f.read())
+    return digest.hexdigest()
+
+
+def load_manifest(output_dir):
+    """
+    Load the previous build's manifest, or an empty one
+    """
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def chunks(items, size):
+    """Split a list into consecutive chunks of at most size items"""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def build_site(output_dir, db_path=None, workers=None, base_url='', force=False):
+    """
+    Build (or incrementally update) the static site in output_dir
+    Returns a dict summarising what was rendered
+    """
+    db_path = db_path or viewer.DATABASE
+    os.makedirs(output_dir, exist_ok=True)
+    init_renderer(db_path, base_url)
+
+    manifest = load_manifest(output_dir)
+    layout = {'templates': templates_hash(), 'base_url': base_url}
+    if force or manifest.get('layout') != layout:
+        previous = {}
+    else:
+        previous = manifest.get('conversations', {})
+
+    print("🔍 Hashing conversations...")
+    current = conversation_hashes(db_path)
+    hashed_ids = sum(1 for conv_id in current if not SAFE_ID_RE.match(conv_id))
+
+    changed = sorted(conv_id for conv_id, digest in current.items() if previous.get(conv_id) != digest)
+
+    # Remove every published page without a conversation, whatever the last
+    # manifest says, so a forced or layout rebuild cannot leave deleted pages behind
+    chat_dir = os.path.join(output_dir, 'chat')
+    published = set(os.listdir(chat_dir)) if os.path.isdir(chat_dir) else set()
+    removed = sorted(published - {page_id(conv_id) for conv_id in current})
+
+    for name in removed:
+        shutil.rmtree(os.path.join(chat_dir, name), ignore_errors=True)
+
+    # List pages show titles and ordering, so any change rebuilds all of them
+    total_pages = max(1, (len(current) + viewer.ITEMS_PER_PAGE - 1) // viewer.ITEMS_PER_PAGE)
+    rebuild_lists = bool(changed or removed or not previous)
+    pages = list(range(1, total_pages + 1)) if rebuild_lists else []
+
+    if rebuild_lists:
+        # Drop list pages beyond the new last page
+        page_dir = os.path.join(output_dir, 'page')
+        if os.path.isdir(page_dir):
+            for name in os.listdir(page_dir):
+                if name.isdigit() and int(name) > total_pages:
+                    shutil.rmtree(os.path.join(page_dir, name), ignore_errors=True)
+
+    print(f"🛠  Rendering {len(changed)} conversations and {len(pages)} list pages...")
+    start = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_renderer,
+                             initargs=(db_path, base_url)) as executor:
+        futures = [executor.submit(render_conversations, output_dir, chunk)
+                   for chunk in chunks(changed, CHUNK_SIZE)]
+        futures += [executor.submit(render_list_pages, output_dir, chunk)
+                    for chunk in chunks(pages, CHUNK_SIZE)]
+        for future in futures:
+            future.result()
+
+    # Stats and contribution data depend on the current date; always refresh
+    write_file(output_dir, 'stats/index.html', render_view('stats', '/stats'))
+    write_file(output_dir, 'api/contribution_data.json',
+               render_view('contribution_data', '/api/contribution_data'))
+
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump({'layout': layout, 'conversations': current}, f)
+
+    return {
+        'conversations': len(current),
+        'rendered_conversations': len(changed),
+        'removed_conversations': len(removed),
+        'hashed_ids': hashed_ids,
+        'rendered_list_pages': len(pages),
+        'seconds': round(time.perf_counter() - start, 2)
+    }
+
+
+def main():
+    """
+    Main entry point for the static site builder
+    """
+    parser = argparse.ArgumentParser(description='Pre-render the conversation archive as a static site')
+    parser.add_argument('output_dir', nargs='?', default='site', help='output directory (default: site)')
+    parser.add_argument('--db', default=viewer.DATABASE, help='SQLite database to render')
+    parser.add_argument('--workers', type=int, default=None, help='render processes (default: CPU count)')
+    parser.add_argument('--base-url', default='', help='URL prefix when the site is not served from /')
+    parser.add_argument('--force', action='store_true', help='re-render every conversation')
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("ChatGPT Conversation Viewer - Static Site Builder")
+    print("=" * 60)
+
+    if not os.path.exists(args.db):
+        print(f"✗ Error: Database not found: {args.db}")
+        sys.exit(1)
+
+    summary = build_site(args.output_dir, args.db, args.workers, args.base_url, args.force)
+
+    print(f"\n✅ Static site written to {args.output_dir}")
+    print(f"   Conversations: {summary['conversations']} "
+          f"({summary['rendered_conversations']} rendered, {summary['removed_conversations']} removed)")
+    if summary['hashed_ids']:
+        print(f"   Conversations published under hashed paths (ids unsafe as directory names): "
+              f"{summary['hashed_ids']}")
+    print(f"   List pages rendered: {summary['rendered_list_pages']}")
+    print(f"   Render time: {summary['seconds']}s")
+    print("=" * 60)
+
+
+if __name__ == '__main__':
+    main()
@@ -7,11 +7,52 @@ Parses large JSON files using streaming with ijson to avoid memory issues
 
 import sqlite3
 import ijson
+import re
+import zipfile
+from contextlib import contextmanager
 from datetime import datetime
 import sys
 import os
 
 
+# Keys that identify an object as a single conversation rather than a wrapper
+CONVERSATION_KEYS = ('id', 'conversation_id', 'title', 'create_time', 'update_time', 'mapping', 'current_node')
+
+# Scalar conversation fields kept while streaming; everything else is skipped
+CONVERSATION_FIELDS = ('id', 'conversation_id', 'title', 'create_time')
+
+# Import buffer budget: flush once buffered rows reach this many megabytes
+DEFAULT_MAX_BUFFER_MB = 64
+# Approximate per-row cost of a buffered tuple besides its text
+ROW_OVERHEAD_BYTES = 200
+
+# Prefix of the temporary conversation keys used while a conversation's id is
+# not parsed yet; rows under such keys only ever live in the staging tables
+PLACEHOLDER_PREFIX = '__pending_'
+
+# Upsert of one messages row: existing rows are only rewritten (and stamped with
+# the import generation) when their data changed; comparing conversation_id
+# also repairs rows left under a stale placeholder key by older versions
+MESSAGE_UPSERT = '''
+    ON CONFLICT(id) DO UPDATE SET
+        conversation_id = excluded.conversation_id,
+        role = excluded.role,
+        content = excluded.content,
+        create_time = excluded.create_time,
+        import_generation = excluded.import_generation
+    WHERE conversation_id IS NOT excluded.conversation_id
+       OR role IS NOT excluded.role
+       OR content IS NOT excluded.content
+       OR create_time IS NOT excluded.create_time
+'''
+
+# Fenced code block: opening fence with optional language, body, matching closing fence
+FENCED_CODE_RE = re.compile(
+    r'^[ \t]*(?P<fence>`{3,}|~{3,})[ \t]*(?P<language>[\w+#.-]*)[^\n]*\n(?P<code>.*?)^[ \t]*(?P=fence)[ \t]*$',
+    re.MULTILINE | re.DOTALL
+)
+
+
 def create_database(db_path='data/chat_history.db'):
     """
     Create SQLite database with conversations and messages tables
@@ -26,7 +67,8 @@ def create_database(db_path='data/chat_history.db'):
             title TEXT,
             create_time DATETIME,
             tags TEXT,
-            total_char_count INTEGER
+            total_char_count INTEGER,
+            import_generation INTEGER
         )
     ''')
     
@@ -38,10 +80,46 @@ def create_database(db_path='data/chat_history.db'):
             role TEXT,
             content TEXT,
             create_time DATETIME,
+            import_generation INTEGER,
             FOREIGN KEY (conversation_id) REFERENCES conversations(id)
         )
     ''')
     
+    # Databases created before import generations were tracked per row
+    for table in ('conversations', 'messages'):
+        cursor.execute(f'PRAGMA table_info({table})')
+        if 'import_generation' not in [column[1] for column in cursor.fetchall()]:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN import_generation INTEGER')
+    
+    # Create imports table: one row per ETL run (the import "generation")
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS imports (
+            generation INTEGER PRIMARY KEY AUTOINCREMENT,
+            source TEXT,
+            started_at DATETIME,
+            completed_at DATETIME,
+            failed_at DATETIME,
+            conversation_count INTEGER,
+            message_count INTEGER
+        )
+    ''')
+    
+    # Databases created before failed runs were recorded lack failed_at
+    cursor.execute('PRAGMA table_info(imports)')
+    if 'failed_at' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE imports ADD COLUMN failed_at DATETIME')
+    
+    # Create code_snippets table: fenced code blocks extracted from messages
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS code_snippets (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            message_id TEXT,
+            language TEXT,
+            code TEXT,
+            FOREIGN KEY (message_id) REFERENCES messages(id)
+        )
+    ''')
+    
     # Create indexes for faster queries
     cursor.execute('''
         CREATE INDEX IF NOT EXISTS idx_conv_create_time 
@@ -58,10 +136,44 @@ def create_database(db_path='data/chat_history.db'):
         ON messages(create_time)
     ''')
     
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_conv_import_generation 
+        ON conversations(import_generation)
+    ''')
+    
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_msg_import_generation 
+        ON messages(import_generation)
+    ''')
+    
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_snippet_language 
+        ON code_snippets(language)
+    ''')
+    
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_snippet_message_id 
+        ON code_snippets(message_id)
+    ''')
+    
     # Full-text search for messages
+    # Earlier databases declared a message_id column that does not exist in the
+    # messages content table, which breaks snippet(); recreate those indexes
+    cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'messages_fts'")
+    existing_fts = cursor.fetchone()
+    if existing_fts and 'message_id' in existing_fts[0]:
+        cursor.execute('DROP TABLE messages_fts')
+    
     cursor.execute('''
         CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts 
-        USING fts5(message_id, content, content=messages, content_rowid=rowid)
+        USING fts5(content, content=messages, content_rowid=rowid)
+    ''')
+    
+    # Full-text search for code snippets; '_' is kept inside tokens so
+    # identifiers such as user_id are searchable as a whole
+    cursor.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS code_snippets_fts 
+        USING fts5(code, content=code_snippets, content_rowid=id, tokenize="unicode61 tokenchars '_'")
     ''')
     
     conn.commit()
@@ -94,6 +206,19 @@ def extract_message_content(message_data):
     return str(content)
 
 
+def extract_code_blocks(content):
+    """
+    Extract fenced code blocks from message content
+    Returns a list of (language, code) tuples; language is lowercased, '' if unset
+    """
+    if not content or ('```' not in content and '~~~' not in content):
+        return []
+    
+    return [(match.group('language').lower(), match.group('code').rstrip('\n'))
+            for match in FENCED_CODE_RE.finditer(content)
+            if match.group('code').strip()]
+
+
 def generate_tags(title):
     """
     Generate tags based on conversation title
@@ -117,10 +242,418 @@ def generate_tags(title):
     return ', '.join(tags) if tags else ''
 
 
-def parse_and_insert(json_path='data/conversations.json', db_path='data/chat_history.db', batch_size=1000):
+def find_conversations_member(archive):
+    """
+    Locate conversations.json inside a ChatGPT export archive
+    """
+    candidates = [name for name in archive.namelist()
+                  if os.path.basename(name) == 'conversations.json']
+    if not candidates:
+        raise FileNotFoundError('conversations.json not found in archive')
+    # Prefer the shallowest match (exports put it at the archive root)
+    return min(candidates, key=lambda name: name.count('/'))
+
+
+@contextmanager
+def open_export(json_path):
+    """
+    Open a ChatGPT export for streaming
+    Accepts either a plain conversations.json or the export .zip archive.
+    Yields (stream, raw_file): stream is the JSON byte stream, raw_file.tell()
+    reports how many bytes of the file on disk (compressed for a ZIP) were read
+    """
+    raw_file = open(json_path, 'rb')
+    try:
+        if zipfile.is_zipfile(raw_file):
+            raw_file.seek(0)
+            archive = zipfile.ZipFile(raw_file)
+            member = find_conversations_member(archive)
+            print(f"   Streaming {member} from ZIP archive")
+            with archive.open(member) as stream:
+                yield stream, raw_file
+        else:
+            raw_file.seek(0)
+            yield raw_file, raw_file
+    finally:
+        raw_file.close()
+
+
+def build_value(events, event, value):
+    """
+    Build the Python value whose first parse event is (event, value)
+    Consumes the remaining events of that value from the iterator
+    """
+    if event not in ('start_map', 'start_array'):
+        return value
+    
+    builder = ijson.ObjectBuilder()
+    builder.event(event, value)
+    depth = 1
+    for event, value in events:
+        builder.event(event, value)
+        if event in ('start_map', 'start_array'):
+            depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+            if depth == 0:
+                break
+    return builder.value
+
+
+def skip_value(events, event):
+    """
+    Consume the events of a value without building it
+    """
+    if event not in ('start_map', 'start_array'):
+        return
+    
+    depth = 1
+    for event, _ in events:
+        if event in ('start_map', 'start_array'):
+            depth += 1
+        elif event in ('end_map', 'end_array'):
+            depth -= 1
+            if depth == 0:
+                return
+
+
+def iter_mapping_messages(events):
+    """
+    Yield (node_id, message) for each node of a conversation's mapping
+    Only one node's message is ever built at a time; everything else in the
+    node (children, parent ...) is skipped
+    """
+    for event, node_id in events:
+        if event != 'map_key':
+            return
+        
+        event, value = next(events)
+        if event != 'start_map':
+            skip_value(events, event)
+            continue
+        
+        for event, key in events:
+            if event != 'map_key':
+                break
+            event, value = next(events)
+            if key == 'message' and event == 'start_map':
+                yield node_id, build_value(events, event, value)
+            else:
+                skip_value(events, event)
+
+
+def iter_conversation_records(events, first_key=None, default_id=None):
+    """
+    Yield the records of one conversation object whose start_map was consumed
+    Emits ('message', node_id, message, fields) for every mapping node, then
+    ('conversation', fields) once the object ends. fields holds the scalar
+    conversation fields seen so far; ChatGPT exports put 'id' after 'mapping',
+    so it is usually still missing while messages stream past
+    """
+    fields = {}
+    key = first_key
+    if key is None:
+        event, key = next(events)
+        if event != 'map_key':
+            key = None
+    
+    while key is not None:
+        event, value = next(events)
+        if key == 'mapping' and event == 'start_map':
+            for node_id, message in iter_mapping_messages(events):
+                yield 'message', node_id, message, fields
+        elif key in CONVERSATION_FIELDS:
+            fields[key] = build_value(events, event, value)
+        else:
+            skip_value(events, event)
+        
+        event, key = next(events)
+        if event != 'map_key':
+            key = None
+    
+    if default_id is not None:
+        fields.setdefault('id', default_id)
+    yield 'conversation', fields
+
+
+def iter_conversation_array(events):
+    """
+    Yield the records of every conversation in an array whose start was consumed
+    """
+    for event, value in events:
+        if event == 'end_array':
+            return
+        if event == 'start_map':
+            yield from iter_conversation_records(events)
+        else:
+            skip_value(events, event)
+
+
+def iter_export_records(stream):
+    """
+    Stream conversation records out of a JSON export at the parse-event level
+    Handles array-rooted exports ([{...}, ...]) as well as object-rooted ones:
+    a {"conversations": [...]} wrapper, an id-keyed map ({"<id>": {...}})
+    or a single conversation object. See iter_conversation_records() for the
+    records produced
+    """
+    events = ijson.basic_parse(stream)
+    event, value = next(events, (None, None))
+    
+    if event == 'start_array':
+        yield from iter_conversation_array(events)
+        return
+    
+    if event != 'start_map':
+        return
+    
+    event, key = next(events)
+    if event != 'map_key':
+        return
+    
+    if key in CONVERSATION_KEYS:
+        yield from iter_conversation_records(events, first_key=key)
+        return
+    
+    while event == 'map_key':
+        event, value = next(events)
+        if key == 'conversations' and event == 'start_array':
+            yield from iter_conversation_array(events)
+        elif key != 'conversations' and event == 'start_map':
+            yield from iter_conversation_records(events, default_id=key)
+        else:
+            skip_value(events, event)
+        event, key = next(events)
+
+
+def insert_batch(cursor, conv_batch, msg_batch, snippet_batch, generation):
+    """
+    Write one batch of conversations, messages and code snippets
+    Rows are compact tuples. Existing rows are only rewritten (and stamped
+    with this import generation) when their data changed, so incremental
+    exports can select rows by import_generation; snippets of re-imported
+    messages are replaced rather than duplicated
+    """
+    cursor.executemany('''
+        INSERT INTO conversations (id, title, create_time, tags, total_char_count, import_generation)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(id) DO UPDATE SET
+            title = excluded.title,
+            create_time = excluded.create_time,
+            tags = excluded.tags,
+            total_char_count = excluded.total_char_count,
+            import_generation = excluded.import_generation
+        WHERE title IS NOT excluded.title
+           OR create_time IS NOT excluded.create_time
+           OR tags IS NOT excluded.tags
+           OR total_char_count IS NOT excluded.total_char_count
+    ''', (row + (generation,) for row in conv_batch))
+    
+    cursor.executemany('''
+        INSERT INTO messages (id, conversation_id, role, content, create_time, import_generation)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''' + MESSAGE_UPSERT, (row + (generation,) for row in msg_batch))
+    
+    cursor.executemany(
+        'DELETE FROM code_snippets WHERE message_id = ?',
+        ((msg[0],) for msg in msg_batch)
+    )
+    cursor.executemany(
+        'INSERT INTO code_snippets (message_id, language, code) VALUES (?, ?, ?)',
+        snippet_batch
+    )
+
+
+class ImportBuffer:
+    """
+    Row- and byte-bounded buffer of rows waiting to be written to SQLite
+    Messages are held as (id, conversation_id, role, content, create_time)
+    tuples; the rows of the conversation currently being parsed start at
+    conv_start so they can be re-keyed once its id is known. Rows still under
+    a placeholder key are flushed to the staging tables, never to messages
+    """
+    
+    def __init__(self, cursor, generation, max_rows, max_bytes):
+        self.cursor = cursor
+        self.generation = generation
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.conversations = []
+        self.messages = []
+        self.snippets = []
+        self.conv_start = 0
+        self.snippet_start = 0
+        self.bytes = 0
+    
+    def add_conversation(self, row):
+        """Buffer a conversations row"""
+        self.conversations.append(row)
+        self.bytes += ROW_OVERHEAD_BYTES
+    
+    def add_message(self, row, snippets):
+        """Buffer a messages row together with its code snippet rows"""
+        self.messages.append(row)
+        self.snippets.extend(snippets)
+        self.bytes += ROW_OVERHEAD_BYTES + sys.getsizeof(row[3])
+        self.bytes += sum(ROW_OVERHEAD_BYTES + sys.getsizeof(code) for _, _, code in snippets)
+    
+    def is_full(self):
+        """Whether the row or byte budget has been reached"""
+        rows = len(self.conversations) + len(self.messages) + len(self.snippets)
+        return rows >= self.max_rows or self.bytes >= self.max_bytes
+    
+    def start_conversation(self):
+        """Mark where the next conversation's rows begin"""
+        self.conv_start = len(self.messages)
+        self.snippet_start = len(self.snippets)
+    
+    def rekey_conversation(self, old_key, new_key):
+        """
+        Replace a placeholder conversation key on the buffered rows of the
+        current conversation (including message ids derived from it)
+        """
+        old_prefix = old_key + '_'
+        
+        def rekey_id(msg_id):
+            if msg_id.startswith(old_prefix):
+                return new_key + msg_id[len(old_key):]
+            return msg_id
+        
+        for i in range(self.conv_start, len(self.messages)):
+            msg_id, _, role, content, create_time = self.messages[i]
+            self.messages[i] = (rekey_id(msg_id), new_key, role, content, create_time)
+        for i in range(self.snippet_start, len(self.snippets)):
+            msg_id, language, code = self.snippets[i]
+            self.snippets[i] = (rekey_id(msg_id), language, code)
+    
+    def drop_conversation(self):
+        """Discard the buffered rows of the current conversation"""
+        del self.messages[self.conv_start:]
+        del self.snippets[self.snippet_start:]
+    
+    def flush(self, placeholder=None):
+        """
+        Write all buffered rows (the caller commits); rows keyed by
+        placeholder go to the staging tables until the conversation id is known
+        """
+        messages = self.messages
+        snippets = self.snippets
+        if placeholder is not None:
+            staged_ids = {row[0] for row in messages if row[1] == placeholder}
+            stage_rows(self.cursor,
+                       [row for row in messages if row[1] == placeholder],
+                       [row for row in snippets if row[0] in staged_ids])
+            messages = [row for row in messages if row[1] != placeholder]
+            snippets = [row for row in snippets if row[0] not in staged_ids]
+        insert_batch(self.cursor, self.conversations, messages, snippets, self.generation)
+        self.conversations = []
+        self.messages = []
+        self.snippets = []
+        self.conv_start = 0
+        self.snippet_start = 0
+        self.bytes = 0
+
+
+def create_staging_tables(cursor):
+    """
+    Create the per-connection staging tables for rows of a conversation whose
+    id is not parsed yet. TEMP tables are invisible to readers and vanish with
+    the connection, so an interrupted import leaves nothing behind
+    """
+    cursor.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS pending_messages (
+            id TEXT PRIMARY KEY,
+            role TEXT,
+            content TEXT,
+            create_time DATETIME
+        )
+    ''')
+    cursor.execute('''
+        CREATE TEMP TABLE IF NOT EXISTS pending_snippets (
+            message_id TEXT,
+            language TEXT,
+            code TEXT
+        )
+    ''')
+
+
+def stage_rows(cursor, msg_rows, snippet_rows):
+    """
+    Write placeholder-keyed message and snippet rows to the staging tables
+    """
+    cursor.executemany(
+        'INSERT OR REPLACE INTO temp.pending_messages (id, role, content, create_time) VALUES (?, ?, ?, ?)',
+        ((msg_id, role, content, create_time) for msg_id, _, role, content, create_time in msg_rows)
+    )
+    cursor.executemany(
+        'INSERT INTO temp.pending_snippets (message_id, language, code) VALUES (?, ?, ?)',
+        snippet_rows
+    )
+
+
+def publish_staged_conversation(cursor, old_key, new_key, generation):
+    """
+    Move a conversation's staged rows into messages/code_snippets under its
+    real id, re-keying message ids that were derived from the placeholder
+    """
+    old_prefix = old_key + '_'
+    rekey_params = (new_key, len(old_key) + 1, len(old_prefix), old_prefix)
+    cursor.execute('''
+        UPDATE temp.pending_messages SET id = ? || substr(id, ?)
+        WHERE substr(id, 1, ?) = ?
+    ''', rekey_params)
+    cursor.execute('''
+        UPDATE temp.pending_snippets SET message_id = ? || substr(message_id, ?)
+        WHERE substr(message_id, 1, ?) = ?
+    ''', rekey_params)
+    
+    # "WHERE true" keeps the upsert clause from parsing as a join constraint
+    cursor.execute('''
+        INSERT INTO messages (id, conversation_id, role, content, create_time, import_generation)
+        SELECT id, ?, role, content, create_time, ? FROM temp.pending_messages WHERE true
+    ''' + MESSAGE_UPSERT, (new_key, generation))
+    cursor.execute('''
+        DELETE FROM code_snippets
+        WHERE message_id IN (SELECT id FROM temp.pending_messages)
+    ''')
+    cursor.execute('''
+        INSERT INTO code_snippets (message_id, language, code)
+        SELECT message_id, language, code FROM temp.pending_snippets ORDER BY rowid
+    ''')
+    clear_staging_tables(cursor)
+
+
+def clear_staging_tables(cursor):
+    """
+    Discard staged rows (after publishing, or for a conversation without an id)
+    """
+    cursor.execute('DELETE FROM temp.pending_messages')
+    cursor.execute('DELETE FROM temp.pending_snippets')
+
+
+def delete_placeholder_rows(cursor):
+    """
+    Remove rows that older versions committed under a placeholder key and
+    never re-keyed because the import was interrupted
+    """
+    pending = f"conversation_id GLOB '{PLACEHOLDER_PREFIX}*'"
+    cursor.execute(f'''
+        DELETE FROM code_snippets
+        WHERE message_id IN (SELECT id FROM messages WHERE {pending})
+    ''')
+    cursor.execute(f'DELETE FROM messages WHERE {pending}')
+    return cursor.rowcount
+
+
+def parse_and_insert(json_path='data/conversations.json', db_path='data/chat_history.db',
+                     batch_size=5000, max_buffer_mb=DEFAULT_MAX_BUFFER_MB):
     """
     Parse JSON file using streaming and insert into SQLite database
-    Uses ijson to avoid loading entire file into memory
+    Uses ijson at the parse-event level so only one mapping node is built at a
+    time, even for giant conversations; json_path may also be the export .zip,
+    in which case conversations.json is streamed from it.
+    Buffered rows are flushed every batch_size rows or max_buffer_mb megabytes,
+    whichever comes first, which bounds the importer's memory use
     """
     if not os.path.exists(json_path):
         print(f"✗ Error: File not found: {json_path}")
@@ -129,54 +662,59 @@ def parse_and_insert(json_path='data/conversations.json', db_path='data/chat_his
     conn = sqlite3.connect(db_path)
     cursor = conn.cursor()
     
-    conv_batch = []
-    msg_batch = []
+    # Start a new import generation; it stays in progress until the run
+    # completes or is marked failed below
+    cursor.execute(
+        'INSERT INTO imports (source, started_at) VALUES (?, ?)',
+        (os.path.basename(json_path), datetime.now())
+    )
+    generation = cursor.lastrowid
+    
+    # Rows of databases upgraded from before import generations have none;
+    # they join this generation so incremental exports pick them up
+    for table in ('conversations', 'messages'):
+        cursor.execute(f'UPDATE {table} SET import_generation = ? WHERE import_generation IS NULL', (generation,))
+    
+    stale_rows = delete_placeholder_rows(cursor)
+    if stale_rows:
+        print(f"   Removed {stale_rows} messages left by an interrupted import")
+    create_staging_tables(cursor)
+    conn.commit()
+    
+    buffer = ImportBuffer(cursor, generation, batch_size, max_buffer_mb * 1024 * 1024)
     
     total_conversations = 0
     total_messages = 0
+    total_snippets = 0
+    
+    file_size = os.path.getsize(json_path)
     
     print(f"📖 Parsing {json_path} using streaming...")
-    print(f"   File size: {os.path.getsize(json_path) / 1024 / 1024:.2f} MB")
+    print(f"   File size: {file_size / 1024 / 1024:.2f} MB")
+    
+    # Per-conversation state; the placeholder key stands in for the
+    # conversation id until the id is parsed
+    placeholder = None
+    flushed_placeholder = False
+    conversation_messages = 0
+    conversation_snippets = 0
+    total_chars = 0
+    
+    def flush():
+        nonlocal flushed_placeholder
+        buffer.flush(placeholder)
+        conn.commit()
+        flushed_placeholder = flushed_placeholder or placeholder is not None
+        progress = raw_file.tell() / file_size * 100 if file_size else 100
+        print(f"   ✓ Processed {total_conversations} conversations, {total_messages} messages... ({progress:.1f}%)")
     
     try:
-        with open(json_path, 'rb') as f:
-            # Stream through each conversation item
-            # Check if JSON is array or object
-            # Use 'item' for arrays at root level
-            parser = ijson.items(f, 'item')
-            
-            for conv in parser:
-                try:
-                    # Extract conversation metadata
-                    conv_id = conv.get('id') or conv.get('conversation_id')
-                    if not conv_id:
-                        continue
-                    
-                    title = conv.get('title', 'Untitled')
-                    create_time_unix = conv.get('create_time', 0)
-                    # Convert Decimal to float if needed
-                    if create_time_unix:
-                        create_time_unix = float(create_time_unix)
-                        create_time = datetime.fromtimestamp(create_time_unix)
-                    else:
-                        create_time = datetime.now()
-                    
-                    # Generate tags
-                    tags = generate_tags(title)
-                    
-                    # Extract messages from mapping
-                    mapping = conv.get('mapping', {})
-                    conversation_messages = []
-                    total_chars = 0
-                    
-                    for node_id, node_data in mapping.items():
-                        if not node_data or not isinstance(node_data, dict):
-                            continue
-                        
-                        message = node_data.get('message')
-                        if not message:
-                            continue
-                        
+        with open_export(json_path) as (stream, raw_file):
+            # Stream through each conversation, whatever the root layout
+            for record in iter_export_records(stream):
+                if record[0] == 'message':
+                    _, node_id, message, fields = record
+                    try:
                         # Extract role
                         author = message.get('author', {})
                         role = author.get('role') if isinstance(author, dict) else None
@@ -190,28 +728,72 @@ def parse_and_insert(json_path='data/conversations.json', db_path='data/chat_his
                         if not content or content.strip() == '':
                             continue
                         
-                        # Get message creation time
-                        msg_create_time_unix = message.get('create_time', create_time_unix)
+                        conv_key = fields.get('id') or fields.get('conversation_id')
+                        if not conv_key:
+                            if placeholder is None:
+                                placeholder = f"{PLACEHOLDER_PREFIX}{generation}_{total_conversations}__"
+                            conv_key = placeholder
+                        
+                        # Get message creation time, falling back to the
+                        # conversation's (or the import time if not seen yet)
+                        msg_create_time_unix = message.get('create_time') or fields.get('create_time')
                         if msg_create_time_unix:
                             msg_create_time = datetime.fromtimestamp(float(msg_create_time_unix))
                         else:
-                            msg_create_time = create_time
+                            msg_create_time = datetime.now()
                         
                         # Get message ID
-                        msg_id = message.get('id', f"{conv_id}_{node_id}")
+                        msg_id = message.get('id') or f"{conv_key}_{node_id}"
                         
-                        conversation_messages.append({
-                            'id': msg_id,
-                            'conversation_id': conv_id,
-                            'role': role,
-                            'content': content,
-                            'create_time': msg_create_time
-                        })
+                        # Extract fenced code blocks for the snippet index
+                        snippets = [(msg_id, language, code) for language, code in extract_code_blocks(content)]
                         
+                        buffer.add_message((msg_id, conv_key, role, content, msg_create_time), snippets)
+                        
+                        conversation_messages += 1
+                        conversation_snippets += len(snippets)
+                        total_messages += 1
                         total_chars += len(content)
+                    except Exception as e:
+                        print(f"   ⚠ Warning: Error processing message: {e}")
+                        continue
+                    
+                    # Flush by row or byte budget, even mid-conversation
+                    if buffer.is_full():
+                        flush()
+                    continue
+                
+                _, fields = record
+                try:
+                    # Extract conversation metadata
+                    conv_id = fields.get('id') or fields.get('conversation_id')
+                    
+                    if placeholder is not None:
+                        if conv_id:
+                            buffer.rekey_conversation(placeholder, conv_id)
+                            if flushed_placeholder:
+                                publish_staged_conversation(cursor, placeholder, conv_id, generation)
+                        else:
+                            buffer.drop_conversation()
+                            if flushed_placeholder:
+                                clear_staging_tables(cursor)
                     
-                    # Add conversation to batch
-                    conv_batch.append((
+                    if not conv_id:
+                        total_messages -= conversation_messages
+                        continue
+                    
+                    title = fields.get('title', 'Untitled')
+                    create_time_unix = fields.get('create_time', 0)
+                    # Convert Decimal to float if needed
+                    if create_time_unix:
+                        create_time = datetime.fromtimestamp(float(create_time_unix))
+                    else:
+                        create_time = datetime.now()
+                    
+                    # Generate tags
+                    tags = generate_tags(title)
+                    
+                    buffer.add_conversation((
                         conv_id,
                         title,
                         create_time,
@@ -219,71 +801,60 @@ def parse_and_insert(json_path='data/conversations.json', db_path='data/chat_his
                         total_chars
                     ))
                     
-                    # Add messages to batch
-                    msg_batch.extend(conversation_messages)
-                    
                     total_conversations += 1
-                    total_messages += len(conversation_messages)
-                    
-                    # Commit in batches to balance memory and I/O
-                    if len(conv_batch) >= batch_size:
-                        # Insert conversations
-                        cursor.executemany(
-                            'INSERT OR REPLACE INTO conversations VALUES (?, ?, ?, ?, ?)',
-                            conv_batch
-                        )
-                        
-                        # Insert messages
-                        for msg in msg_batch:
-                            cursor.execute(
-                                'INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?)',
-                                (msg['id'], msg['conversation_id'], msg['role'], 
-                                 msg['content'], msg['create_time'])
-                            )
-                        
-                        conn.commit()
-                        print(f"   ✓ Processed {total_conversations} conversations, {total_messages} messages...")
-                        
-                        conv_batch = []
-                        msg_batch = []
+                    total_snippets += conversation_snippets
                 
                 except Exception as e:
                     print(f"   ⚠ Warning: Error processing conversation: {e}")
-                    continue
+                
+                finally:
+                    placeholder = None
+                    flushed_placeholder = False
+                    conversation_messages = 0
+                    conversation_snippets = 0
+                    total_chars = 0
+                    buffer.start_conversation()
+                
+                if buffer.is_full():
+                    flush()
         
         # Insert remaining batch
-        if conv_batch:
-            cursor.executemany(
-                'INSERT OR REPLACE INTO conversations VALUES (?, ?, ?, ?, ?)',
-                conv_batch
-            )
-            
-            for msg in msg_batch:
-                cursor.execute(
-                    'INSERT OR REPLACE INTO messages VALUES (?, ?, ?, ?, ?)',
-                    (msg['id'], msg['conversation_id'], msg['role'], 
-                     msg['content'], msg['create_time'])
-                )
-            
-            conn.commit()
+        buffer.flush()
+        conn.commit()
         
         # Update FTS index
         print("📝 Building full-text search index...")
-        cursor.execute('''
-            INSERT INTO messages_fts(message_id, content)
-            SELECT id, content FROM messages
-        ''')
+        # Rebuild from the content table so FTS rowids always match messages.rowid
+        cursor.execute("INSERT INTO messages_fts(messages_fts) VALUES('rebuild')")
+        cursor.execute("INSERT INTO code_snippets_fts(code_snippets_fts) VALUES('rebuild')")
+        conn.commit()
+        
+        cursor.execute(
+            'UPDATE imports SET completed_at = ?, conversation_count = ?, message_count = ? WHERE generation = ?',
+            (datetime.now(), total_conversations, total_messages, generation)
+        )
         conn.commit()
         
         print(f"\n✅ Import completed successfully!")
+        print(f"   Import generation: {generation}")
         print(f"   Total conversations: {total_conversations}")
         print(f"   Total messages: {total_messages}")
+        print(f"   Total code snippets: {total_snippets}")
         
     except Exception as e:
         print(f"✗ Error during parsing: {e}")
         import traceback
         traceback.print_exc()
     finally:
+        # Record aborted runs (errors or Ctrl+C) so readers stop treating the
+        # generation as in progress; batches already committed keep its stamp,
+        # while staged placeholder rows are dropped with the connection
+        conn.rollback()
+        cursor.execute(
+            'UPDATE imports SET failed_at = ? WHERE generation = ? AND completed_at IS NULL',
+            (datetime.now(), generation)
+        )
+        conn.commit()
         conn.close()
 
 
@@ -295,7 +866,7 @@ def main():
     print("ChatGPT Conversation History - ETL Script")
     print("=" * 60)
     
-    # Get JSON file path from command line or use default
+    # Get JSON (or export .zip) path from command line or use default
     json_path = sys.argv[1] if len(sys.argv) > 1 else 'data/conversations.json'
     db_path = sys.argv[2] if len(sys.argv) > 2 else 'data/chat_history.db'
     
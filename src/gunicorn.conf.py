@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+"""
+Gunicorn configuration for ChatGPT Conversation Viewer
+Usage: gunicorn -c gunicorn.conf.py app:app
+"""
+
+import os
+
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', '4'))
+
+# Load the app in the master before forking; with PRELOAD_HEAVY_MODULES the
+# markdown/reportlab modules and compiled templates are then shared
+# copy-on-write by every worker instead of being loaded once per worker
+preload_app = True
+os.environ.setdefault('PRELOAD_HEAVY_MODULES', '1')
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP Load Test for ChatGPT Conversation Viewer
+Replays a weighted mix of routes at a fixed concurrency and reports
+throughput and p50/p95/p99 latency per route as JSON.
+Targets: the Flask test client (default), a local threaded server ('serve'),
+both seeded with the synthetic dataset from bench_import.py, or any
+running instance via --url
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import math
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+import app as viewer
+from bench_import import WORDS, write_synthetic_export
+from etl_script import create_database, parse_and_insert
+
+
+DEFAULT_MIX = 'index=25,search=15,api_search=10,chat=25,stats=5,contribution=5,export_md=10,export_pdf=5'
+
+# Route name -> builds a request path from the shared target data
+ROUTES = {
+    'index': lambda rng, ids: f"/?page={rng.randint(1, 5)}",
+    'search': lambda rng, ids: f"/?q={rng.choice(WORDS)}",
+    'api_search': lambda rng, ids: f"/api/search?q={rng.choice(WORDS)}",
+    'chat': lambda rng, ids: f"/chat/{rng.choice(ids)}",
+    'stats': lambda rng, ids: "/stats",
+    'contribution': lambda rng, ids: "/api/contribution_data",
+    'export_md': lambda rng, ids: f"/export/{rng.choice(ids)}/markdown",
+    'export_pdf': lambda rng, ids: f"/export/{rng.choice(ids)}/pdf"
+}
+
+
+def parse_mix(mix):
+    """
+    Parse "route=weight,..." into a list of (route, weight)
+    """
+    weights = []
+    for item in mix.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in ROUTES:
+            raise ValueError(f"Unknown route in mix: {name} (choose from {', '.join(ROUTES)})")
+        weights.append((name, float(weight or 1)))
+    return weights
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def seed_database(db_path, conversations, messages_per_conversation):
+    """
+    Create a database from a synthetic export (ETL output is silenced)
+    """
+    json_path = os.path.join(os.path.dirname(db_path), 'conversations.json')
+    write_synthetic_export(json_path, conversations, messages_per_conversation)
+    with contextlib.redirect_stdout(io.StringIO()):
+        create_database(db_path)
+        parse_and_insert(json_path, db_path)
+
+
+def make_client_fetcher():
+    """
+    Return fetch(path) -> (status, body) using a per-thread Flask test client
+    """
+    local = threading.local()
+
+    def fetch(path):
+        if not hasattr(local, 'client'):
+            local.client = viewer.app.test_client()
+        response = local.client.get(path)
+        return response.status_code, response.get_data()
+
+    return fetch
+
+
+def make_http_fetcher(base_url, timeout):
+    """
+    Return fetch(path) -> (status, body) over real HTTP
+    """
+    def fetch(path):
+        try:
+            with urllib.request.urlopen(base_url + path, timeout=timeout) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+    return fetch
+
+
+def start_local_server():
+    """
+    Serve the Flask app from a threaded Werkzeug server on a free port
+    """
+    from werkzeug.serving import make_server
+
+    # Per-request access logs would dominate the output and the timings
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, viewer.app, threaded=True)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def fetch_conversation_ids(fetch, limit=1000):
+    """
+    Sample conversation ids from the target's NDJSON export
+    """
+    status, body = fetch('/api/conversations.ndjson')
+    if status != 200:
+        raise RuntimeError(f"Could not list conversations (HTTP {status})")
+    ids = [json.loads(line)['id'] for line in body.splitlines()[:limit] if line.strip()]
+    if not ids:
+        raise RuntimeError("Target has no conversations to request")
+    return ids
+
+
+def run_load(fetch, ids, mix, concurrency, duration, max_requests, warmup, seed):
+    """
+    Run the request mix from `concurrency` threads
+    Returns (samples, elapsed) where samples maps route -> [(latency, ok)]
+    and elapsed excludes the warmup requests
+    """
+    names = [name for name, _ in mix]
+    weights = [weight for _, weight in mix]
+    samples = defaultdict(list)
+    lock = threading.Lock()
+    counter = {'issued': 0, 'measure_start': None}
+    deadline = None
+
+    def next_slot():
+        with lock:
+            if max_requests and counter['issued'] >= max_requests + warmup:
+                return None
+            counter['issued'] += 1
+            # Throughput is measured from the first request after warmup
+            if counter['issued'] == warmup + 1:
+                counter['measure_start'] = time.perf_counter()
+            return counter['issued']
+
+    def worker(worker_seed):
+        rng = random.Random(worker_seed)
+        while deadline is None or time.perf_counter() < deadline:
+            slot = next_slot()
+            if slot is None:
+                return
+            name = rng.choices(names, weights)[0]
+            path = ROUTES[name](rng, ids)
+            start = time.perf_counter()
+            try:
+                status, _ = fetch(path)
+                ok = status < 400
+            except Exception:
+                ok = False
+            latency = time.perf_counter() - start
+            if slot > warmup:
+                with lock:
+                    samples[name].append((latency, ok))
+
+    if duration and not max_requests:
+        deadline = time.perf_counter() + duration
+
+    threads = [threading.Thread(target=worker, args=(seed + i,)) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if counter['measure_start'] is None:
+        return samples, 0.0
+    return samples, time.perf_counter() - counter['measure_start']
+
+
+def summarize(samples, elapsed):
+    """
+    Build the per-route and overall report
+    """
+    routes = {}
+    total = 0
+    errors = 0
+    for name, entries in sorted(samples.items()):
+        latencies = sorted(latency * 1000 for latency, _ in entries)
+        route_errors = sum(1 for _, ok in entries if not ok)
+        total += len(entries)
+        errors += route_errors
+        routes[name] = {
+            'requests': len(entries),
+            'errors': route_errors,
+            'throughput_rps': round(len(entries) / elapsed, 2) if elapsed else None,
+            'p50_ms': round(percentile(latencies, 0.50), 2),
+            'p95_ms': round(percentile(latencies, 0.95), 2),
+            'p99_ms': round(percentile(latencies, 0.99), 2),
+            'max_ms': round(latencies[-1], 2)
+        }
+    return {
+        'requests': total,
+        'errors': errors,
+        'elapsed_s': round(elapsed, 2),
+        'throughput_rps': round(total / elapsed, 2) if elapsed else None,
+        'routes': routes
+    }
+
+
+def main():
+    """
+    Main entry point for the load test
+    """
+    parser = argparse.ArgumentParser(description='Load-test the conversation viewer')
+    parser.add_argument('--mode', choices=('client', 'serve'), default='client',
+                        help='test client or local threaded server (ignored with --url)')
+    parser.add_argument('--url', help='base URL of a running instance; skips seeding')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'route weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10, help='seconds to run (unless --requests)')
+    parser.add_argument('--requests', type=int, default=0, help='stop after this many measured requests')
+    parser.add_argument('--warmup', type=int, default=20, help='requests excluded from the report')
+    parser.add_argument('--conversations', type=int, default=200, help='synthetic conversations to seed')
+    parser.add_argument('--messages', type=int, default=20, help='messages per synthetic conversation')
+    parser.add_argument('--timeout', type=float, default=30, help='HTTP timeout in seconds')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--output', help='write the JSON report to this file')
+    args = parser.parse_args()
+
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        server = None
+        if args.url:
+            target = args.url.rstrip('/')
+            fetch = make_http_fetcher(target, args.timeout)
+        else:
+            db_path = os.path.join(tmp_dir, 'chat_history.db')
+            seed_database(db_path, args.conversations, args.messages)
+            viewer.DATABASE = db_path
+            if args.mode == 'serve':
+                server, target = start_local_server()
+                fetch = make_http_fetcher(target, args.timeout)
+            else:
+                target = 'flask-test-client'
+                fetch = make_client_fetcher()
+
+        try:
+            ids = fetch_conversation_ids(fetch)
+            samples, elapsed = run_load(fetch, ids, mix, args.concurrency, args.duration,
+                                        args.requests, args.warmup, args.seed)
+        finally:
+            if server is not None:
+                server.shutdown()
+
+    report = {
+        'target': target,
+        'concurrency': args.concurrency,
+        'mix': dict(mix)
+    }
+    report.update(summarize(samples, elapsed))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+    print(output)
+
+    if report['errors']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
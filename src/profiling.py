@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Per-Request Profiling for ChatGPT Conversation Viewer
+Opt-in: app.py only imports this module when PROFILING_ENABLED=1 and a
+PROFILING_SECRET is set. A request carrying that secret in the
+X-Profile-Token header runs under cProfile, with SQL statements from
+get_db() connections, Jinja render time and markdown_filter time recorded
+alongside. Results are kept in PROFILING_DIR and served at
+/_debug/profile/<id> (JSON summary, or the raw .prof file with ?download=1)
+"""
+
+import cProfile
+import hmac
+import io
+import json
+import os
+import pstats
+import re
+import sqlite3
+import threading
+import time
+import uuid
+
+from flask import abort, g, has_request_context, jsonify, request, send_file
+from flask.signals import before_render_template, template_rendered
+
+
+PROFILE_HEADER = 'X-Profile-Token'
+PROFILE_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+# Functions listed in the JSON summary, by cumulative time
+TOP_FUNCTIONS = 30
+
+# cProfile cannot profile two requests at once on every Python version;
+# concurrent profiling requests are served unprofiled instead of waiting
+_profile_lock = threading.Lock()
+
+
+class RequestProfile:
+    """
+    Measurements collected while profiling a single request
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.profiler = cProfile.Profile()
+        self.started = time.perf_counter()
+        self.active = True
+        self.sql = []
+        self.templates = []
+        self.markdown_calls = 0
+        self.markdown_seconds = 0.0
+        self._render_starts = []
+
+    def summary(self, response, elapsed):
+        """Build the JSON-serialisable report for this request"""
+        stream = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=stream)
+        stats.sort_stats('cumulative')
+
+        functions = []
+        for func in stats.fcn_list[:TOP_FUNCTIONS]:
+            calls, primitive_calls, total_time, cumulative_time, _ = stats.stats[func]
+            functions.append({
+                'function': pstats.func_std_string(func),
+                'calls': calls,
+                'primitive_calls': primitive_calls,
+                'total_ms': round(total_time * 1000, 3),
+                'cumulative_ms': round(cumulative_time * 1000, 3)
+            })
+
+        return {
+            'id': self.id,
+            'method': request.method,
+            'path': request.full_path if request.query_string else request.path,
+            'status': response.status_code,
+            'created_at': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'total_ms': round(elapsed * 1000, 3),
+            'sql': {
+                'count': len(self.sql),
+                'total_ms': round(sum(s['execute_ms'] + s['fetch_ms'] for s in self.sql), 3),
+                'statements': self.sql
+            },
+            'templates': {
+                'total_ms': round(sum(t['ms'] for t in self.templates), 3),
+                'renders': self.templates
+            },
+            'markdown': {
+                'calls': self.markdown_calls,
+                'total_ms': round(self.markdown_seconds * 1000, 3)
+            },
+            'functions': functions
+        }
+
+
+def current_profile():
+    """Return the profile of the current request, or None"""
+    if not has_request_context():
+        return None
+    profile = g.get('profile')
+    return profile if profile is not None and profile.active else None
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """
+    Cursor that records each statement with its execute and fetch time
+    """
+
+    _entry = None
+
+    def _record(self, sql, method, args):
+        profile = self.connection.profile
+        if profile is None or not profile.active:
+            return method(self, sql, *args)
+        self._entry = {'sql': ' '.join(sql.split()), 'execute_ms': 0.0, 'fetch_ms': 0.0, 'rows': 0}
+        profile.sql.append(self._entry)
+        start = time.perf_counter()
+        try:
+            return method(self, sql, *args)
+        finally:
+            self._entry['execute_ms'] = round((time.perf_counter() - start) * 1000, 3)
+
+    def _timed_fetch(self, method, *args):
+        profile = self.connection.profile
+        if self._entry is None or not profile.active:
+            return method(self, *args)
+        start = time.perf_counter()
+        result = method(self, *args)
+        self._entry['fetch_ms'] = round(self._entry['fetch_ms'] + (time.perf_counter() - start) * 1000, 3)
+        if isinstance(result, list):
+            self._entry['rows'] += len(result)
+        elif result is not None:
+            self._entry['rows'] += 1
+        return result
+
+    def execute(self, sql, *args):
+        self._record(sql, sqlite3.Cursor.execute, args)
+        return self
+
+    def executemany(self, sql, *args):
+        self._record(sql, sqlite3.Cursor.executemany, args)
+        return self
+
+    def fetchone(self):
+        return self._timed_fetch(sqlite3.Cursor.fetchone)
+
+    def fetchmany(self, *args):
+        return self._timed_fetch(sqlite3.Cursor.fetchmany, *args)
+
+    def fetchall(self):
+        return self._timed_fetch(sqlite3.Cursor.fetchall)
+
+    def __next__(self):
+        return self._timed_fetch(sqlite3.Cursor.__next__)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """
+    Connection factory used by get_db() while profiling is enabled
+    Statements are only recorded for connections opened by a profiled request
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.profile = current_profile()
+
+    def cursor(self, factory=ProfiledCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, *args):
+        return self.cursor().execute(sql, *args)
+
+    def executemany(self, sql, *args):
+        return self.cursor().executemany(sql, *args)
+
+
+def _on_before_render(sender, template, context, **extra):
+    profile = current_profile()
+    if profile is not None:
+        profile._render_starts.append(time.perf_counter())
+
+
+def _on_rendered(sender, template, context, **extra):
+    profile = current_profile()
+    if profile is not None and profile._render_starts:
+        elapsed = time.perf_counter() - profile._render_starts.pop()
+        profile.templates.append({'template': template.name, 'ms': round(elapsed * 1000, 3)})
+
+
+def timed_markdown(markdown_filter):
+    """
+    Wrap the markdown template filter so its time is added to the profile
+    """
+    def wrapper(text):
+        profile = current_profile()
+        if profile is None:
+            return markdown_filter(text)
+        start = time.perf_counter()
+        try:
+            return markdown_filter(text)
+        finally:
+            profile.markdown_calls += 1
+            profile.markdown_seconds += time.perf_counter() - start
+
+    wrapper.__name__ = markdown_filter.__name__
+    wrapper.__doc__ = markdown_filter.__doc__
+    return wrapper
+
+
+def has_valid_token(app):
+    """Check the profiling header against the configured secret"""
+    token = request.headers.get(PROFILE_HEADER, '')
+    return bool(token) and hmac.compare_digest(token.encode('utf-8'), app.config['PROFILING_SECRET'].encode('utf-8'))
+
+
+def prune_profiles(profile_dir, keep):
+    """Delete all but the newest `keep` profiles"""
+    summaries = sorted(
+        (name for name in os.listdir(profile_dir) if name.endswith('.json')),
+        key=lambda name: os.path.getmtime(os.path.join(profile_dir, name))
+    )
+    for name in summaries[:max(0, len(summaries) - keep)]:
+        profile_id = name[:-len('.json')]
+        for extension in ('.json', '.prof'):
+            try:
+                os.remove(os.path.join(profile_dir, profile_id + extension))
+            except OSError:
+                pass
+
+
+def install_profiling(app):
+    """
+    Register the request hooks, template signals, markdown timing and the
+    /_debug/profile/<id> route on app
+    PROFILING_DIR must already exist and be private (app.py checks it)
+    """
+    profile_dir = app.config['PROFILING_DIR']
+
+    before_render_template.connect(_on_before_render, app)
+    template_rendered.connect(_on_rendered, app)
+    app.jinja_env.filters['markdown'] = timed_markdown(app.jinja_env.filters['markdown'])
+
+    @app.before_request
+    def start_profile():
+        if request.endpoint == 'debug_profile' or not has_valid_token(app):
+            return
+        if not _profile_lock.acquire(blocking=False):
+            return
+        g.profile = RequestProfile()
+        g.profile.profiler.enable()
+
+    @app.after_request
+    def finish_profile(response):
+        profile = current_profile()
+        if profile is None:
+            return response
+        profile.profiler.disable()
+        profile.active = False
+        elapsed = time.perf_counter() - profile.started
+        _profile_lock.release()
+
+        profile.profiler.dump_stats(os.path.join(profile_dir, profile.id + '.prof'))
+        with open(os.path.join(profile_dir, profile.id + '.json'), 'w', encoding='utf-8') as f:
+            json.dump(profile.summary(response, elapsed), f, ensure_ascii=False)
+        prune_profiles(profile_dir, app.config['PROFILING_MAX_PROFILES'])
+
+        response.headers['X-Profile-Id'] = profile.id
+        return response
+
+    @app.teardown_request
+    def abandon_profile(exc):
+        # Reached with an active profile only if after_request never ran
+        profile = current_profile()
+        if profile is not None:
+            profile.profiler.disable()
+            profile.active = False
+            _profile_lock.release()
+
+    @app.route('/_debug/profile/<profile_id>')
+    def debug_profile(profile_id):
+        """
+        Debug endpoint: JSON summary of a stored profile, or the raw cProfile
+        data with ?download=1 (open with pstats or snakeviz)
+        Requires the same secret header as profiled requests
+        """
+        if not has_valid_token(app) or not PROFILE_ID_RE.match(profile_id):
+            abort(404)
+
+        if request.args.get('download') == '1':
+            path = os.path.join(profile_dir, profile_id + '.prof')
+            if not os.path.exists(path):
+                abort(404)
+            return send_file(path, as_attachment=True, download_name=f'profile-{profile_id}.prof',
+                             mimetype='application/octet-stream')
+
+        path = os.path.join(profile_dir, profile_id + '.json')
+        if not os.path.exists(path):
+            abort(404)
+        with open(path, encoding='utf-8') as f:
+            return jsonify(json.load(f))
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Regression tests for etl_script.py
+Covers imports that flush mid-conversation before the conversation id is
+parsed: interrupted runs must not leave placeholder rows behind, and a later
+import of the full export must restore every conversation
+Run with: python -m unittest test_etl
+"""
+
+import contextlib
+import io
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from bench_import import write_synthetic_export
+from etl_script import PLACEHOLDER_PREFIX, create_database, parse_and_insert
+
+
+def run_quietly(func, *args, **kwargs):
+    """Call func with its progress output (and tracebacks) silenced"""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+class PlaceholderImportTest(unittest.TestCase):
+    """
+    Exports list 'id' after 'mapping', so messages are buffered under a
+    placeholder key; batch_size=10 forces flushes inside each conversation
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp_dir.name, 'chat_history.db')
+        self.json_path = os.path.join(self.tmp_dir.name, 'conversations.json')
+        run_quietly(create_database, self.db_path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def query(self, sql, params=()):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute(sql, params).fetchall()
+        finally:
+            conn.close()
+
+    def placeholder_rows(self):
+        return self.query('SELECT COUNT(*) FROM messages WHERE conversation_id GLOB ?',
+                          (PLACEHOLDER_PREFIX + '*',))[0][0]
+
+    def message_counts(self):
+        return dict(self.query('SELECT conversation_id, COUNT(*) FROM messages GROUP BY conversation_id'))
+
+    def write_truncated_copy(self, fraction):
+        """Write the first fraction of the export, as if the file were cut off"""
+        path = os.path.join(self.tmp_dir.name, 'truncated.json')
+        with open(self.json_path, 'rb') as src, open(path, 'wb') as dst:
+            data = src.read()
+            dst.write(data[:int(len(data) * fraction)])
+        return path
+
+    def test_interrupted_import_leaves_no_placeholder_rows(self):
+        write_synthetic_export(self.json_path, conversations=3, messages_per_conversation=50)
+        run_quietly(parse_and_insert, self.write_truncated_copy(0.9), self.db_path, batch_size=10)
+
+        self.assertEqual(self.placeholder_rows(), 0)
+        self.assertEqual(self.query('SELECT failed_at IS NOT NULL FROM imports'), [(1,)])
+
+    def test_reimport_after_interruption_restores_all_messages(self):
+        write_synthetic_export(self.json_path, conversations=3, messages_per_conversation=50)
+        run_quietly(parse_and_insert, self.write_truncated_copy(0.9), self.db_path, batch_size=10)
+        run_quietly(parse_and_insert, self.json_path, self.db_path, batch_size=10)
+
+        self.assertEqual(self.placeholder_rows(), 0)
+        self.assertEqual(self.message_counts(),
+                         {'conv-000000': 50, 'conv-000001': 50, 'conv-000002': 50})
+        # Snippets follow their messages (every third message has one)
+        orphans = self.query('''
+            SELECT COUNT(*) FROM code_snippets
+            WHERE message_id NOT IN (SELECT id FROM messages)
+        ''')[0][0]
+        self.assertEqual(orphans, 0)
+        self.assertEqual(self.query('SELECT COUNT(*) FROM code_snippets')[0][0], 3 * 17)
+
+    def test_reimport_repairs_rows_left_by_older_versions(self):
+        write_synthetic_export(self.json_path, conversations=3, messages_per_conversation=50)
+        run_quietly(parse_and_insert, self.json_path, self.db_path, batch_size=10)
+
+        # Older versions committed flushed rows under the placeholder key and
+        # left them there when the run was interrupted
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("UPDATE messages SET conversation_id = '__pending_1_2__' WHERE conversation_id = 'conv-000002'")
+        conn.commit()
+        conn.close()
+
+        run_quietly(parse_and_insert, self.json_path, self.db_path, batch_size=10)
+
+        self.assertEqual(self.placeholder_rows(), 0)
+        self.assertEqual(self.message_counts()['conv-000002'], 50)
+
+    def test_rows_without_generation_join_the_next_import(self):
+        write_synthetic_export(self.json_path, conversations=3, messages_per_conversation=50)
+        run_quietly(parse_and_insert, self.json_path, self.db_path, batch_size=10)
+
+        # Databases upgraded from before generations get NULL from ALTER TABLE
+        conn = sqlite3.connect(self.db_path)
+        conn.execute('UPDATE conversations SET import_generation = NULL')
+        conn.execute('UPDATE messages SET import_generation = NULL')
+        conn.commit()
+        conn.close()
+
+        run_quietly(parse_and_insert, self.json_path, self.db_path, batch_size=10)
+
+        self.assertEqual(self.query('SELECT COUNT(*) FROM messages WHERE import_generation > 1'), [(150,)])
+        self.assertEqual(self.query('SELECT COUNT(*) FROM conversations WHERE import_generation > 1'), [(3,)])
+
+    def test_messages_without_ids_are_rekeyed_on_reimport(self):
+        # Messages without an id get ids derived from the conversation key
+        mapping = {
+            f'node-{i}': {'message': {'author': {'role': 'user' if i % 2 == 0 else 'assistant'},
+                                      'create_time': 1700000000 + i,
+                                      'content': {'content_type': 'text', 'parts': [f'message {i}']}}}
+            for i in range(25)
+        }
+        with open(self.json_path, 'w', encoding='utf-8') as f:
+            json.dump([{'title': 'No message ids', 'create_time': 1700000000,
+                        'mapping': mapping, 'id': 'conv-noids'}], f)
+
+        run_quietly(parse_and_insert, self.json_path, self.db_path, batch_size=10)
+        run_quietly(parse_and_insert, self.json_path, self.db_path, batch_size=10)
+
+        ids = {row[0] for row in self.query('SELECT id FROM messages')}
+        self.assertEqual(ids, {f'conv-noids_node-{i}' for i in range(25)})
+        self.assertEqual(self.message_counts(), {'conv-noids': 25})
+
+
+if __name__ == '__main__':
+    unittest.main()